@@ -12,14 +12,24 @@ from modules.business_data_handler import DataAnalyzer
 from modules.metric_tracker import MetricTracker
 from modules.financial_data_handler import FinancialDataHandler
 from modules.strategy_map import StrategyMap
+from modules.data_loader import ChunkedCSVLoader
+from modules.dataset_store import DatasetStore
+from modules.dataset_profile import DatasetProfile
+from modules.conversation_memory import ConversationMemory
 
 
 llm = LLMInterface()
 rag = RAG(llm)
 financial_handler = FinancialDataHandler(llm)
+dataset_store = DatasetStore()
 
 st.set_page_config(page_title="AI-Powered Strategic Navigator for Business", layout="wide")
 
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_stored_dataset(fingerprint):
+    """Shares one memory-mapped copy of each stored dataset across reruns and sessions."""
+    return dataset_store.load(fingerprint)
+
 def store_feedback(response, rating, comment):
     with open("feedback_log.csv", "a") as log:
         log.write(f"{response},{rating},{comment}\n")
@@ -29,7 +39,7 @@ selected_page = display_navigation()
 
 def main():
     if 'conversation' not in st.session_state:
-        st.session_state.conversation = []
+        st.session_state.conversation = ConversationMemory()
 
     if 'uploaded_data' not in st.session_state:
         st.session_state.uploaded_data = None
@@ -165,21 +175,33 @@ def main():
         company_names = st.text_input("Enter the Company Names (comma-separated):")
 
         if company_names:
-            names_list = [name.strip() for name in company_names.split(',')]
-            company_data = financial_handler.get_company_financials(names_list)
+            names_list = [name.strip() for name in company_names.split(',') if name.strip()]
+            st.subheader("Financial Overview")
+            overview = st.empty()
+            overview.caption(f"Loading {len(names_list)} companies...")
+            rows = {}
+            for name, row in financial_handler.iter_company_financials(names_list):
+                rows[name] = row
+                partial = financial_handler.financials_frame(rows.get(n) for n in names_list)
+                if partial is not None:
+                    overview.dataframe(partial)
+            company_data = financial_handler.financials_frame(rows.get(n) for n in names_list)
+            if company_data is None:
+                overview.empty()
+            missing = [name for name in names_list if rows.get(name) is None]
+            if missing:
+                st.caption(f"Could not load: {', '.join(missing)}")
 
             if company_data is not None and not company_data.empty:
                 st.session_state.financial_data = company_data
-                st.subheader("Financial Overview")
-                st.write(company_data)
+                price_data = financial_handler.get_price_indicators(company_data.index)
+                price_summary = f"\n\nPrice performance over the last {financial_handler.prices.period}:\n{price_data.round(3).to_string()}" if not price_data.empty else ""
 
                 
                 if st.button("Generate SWOT Analysis"):
-                    with st.spinner("Generating SWOT Analysis..."):
-                        swot_prompt = f"Generate a SWOT analysis for the following companies based on their financial data and recent news:\n\n{company_data.to_string()}\n\nProvide a SWOT analysis for each company."
-                        swot_analysis = llm.conversational_response([{'sender': 'user', 'text': swot_prompt}])['text']
+                    swot_prompt = f"Generate a SWOT analysis for the following companies based on their financial data and recent news:\n\n{company_data.to_string()}{price_summary}\n\nProvide a SWOT analysis for each company."
                     st.write("**SWOT Analysis:**")
-                    st.write(swot_analysis)
+                    st.write_stream(llm.stream_conversational_response([{'sender': 'user', 'text': swot_prompt}]))
 
                 
                 st.subheader("Financial Metrics Comparison")
@@ -187,11 +209,17 @@ def main():
                 if metrics_to_plot:
                     fig = px.bar(company_data.reset_index(), x='Company Name', y=metrics_to_plot, barmode='group')
                     st.plotly_chart(fig)
+                if not price_data.empty:
+                    st.write(f"**Price Performance ({financial_handler.prices.period}):**")
+                    st.dataframe(price_data.round(3))
 
                 
                 st.subheader("Company News and Sentiment Analysis")
+                all_news, sentiment_by_company, _ = financial_handler.get_news_sentiment(company_data.index)
+                if not sentiment_by_company.empty:
+                    st.dataframe(sentiment_by_company.round(3))
                 for symbol in company_data.index:
-                    news_df = financial_handler.get_company_news(symbol)
+                    news_df = all_news[all_news['Symbol'] == symbol] if not all_news.empty else all_news
                     if not news_df.empty:
                         st.write(f"**News for {company_data.loc[symbol, 'Company Name']} ({symbol}):**")
                         for idx, row in news_df.iterrows():
@@ -202,18 +230,19 @@ def main():
 
                 
                 st.subheader("Recent Changes and Adaptations")
+                insight_placeholders = {}
                 for symbol in company_data.index:
                     st.write(f"**Recent Insights for {company_data.loc[symbol, 'Company Name']} ({symbol}):**")
-                    insights = financial_handler.get_recent_changes(symbol)
-                    st.write(insights)
+                    insight_placeholders[symbol] = st.empty()
+                    insight_placeholders[symbol].caption("Extracting recent changes...")
+                for symbol, insights in financial_handler.iter_recent_changes(company_data.index):
+                    insight_placeholders[symbol].write(insights)
 
                 
                 if st.button("Generate Strategic Recommendations"):
-                    with st.spinner("Analyzing data and generating recommendations..."):
-                        data_summary = company_data.to_string()
-                        strategies = llm.generate_strategic_recommendations(data_summary)
+                    data_summary = company_data.to_string() + price_summary
                     st.write("**Strategic Recommendations:**")
-                    st.write(strategies)
+                    st.write_stream(llm.generate_strategic_recommendations(data_summary, stream=True))
 
             else:
                 st.error("No valid companies found with the provided names. Please check and try again.")
@@ -236,8 +265,19 @@ def main():
         uploaded_file = st.file_uploader("Upload your dataset (CSV):", type=["csv"])
         if uploaded_file is not None:
             try:
-                st.session_state.uploaded_data = pd.read_csv(uploaded_file)
-                st.session_state['data_columns'] = st.session_state.uploaded_data.columns.tolist()
+                upload_id = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+                if st.session_state.get('uploaded_file_id') != upload_id:
+                    progress_bar = st.progress(0.0, text="Loading dataset...")
+                    fingerprint = dataset_store.ingest(
+                        uploaded_file,
+                        ChunkedCSVLoader(),
+                        progress_callback=lambda fraction, rows: progress_bar.progress(fraction, text=f"Loaded {rows:,} rows...")
+                    )
+                    progress_bar.empty()
+                    st.session_state.uploaded_data = load_stored_dataset(fingerprint)
+                    st.session_state['dataset_fingerprint'] = fingerprint
+                    st.session_state['uploaded_file_id'] = upload_id
+                    st.session_state['data_columns'] = st.session_state.uploaded_data.columns.tolist()
                 st.write("Dataset uploaded successfully!")
             except Exception as e:
                 st.error(f"Error in loading dataset: {str(e)}")
@@ -248,10 +288,12 @@ def main():
             data_analyzer = None
 
         with st.expander("Conversation History", expanded=True):
-            if len(st.session_state.conversation) == 0:
+            if not st.session_state.conversation.summary and not st.session_state.conversation.turns:
                 st.write("No conversation history yet.")
             else:
-                for message in st.session_state.conversation:
+                if st.session_state.conversation.summary:
+                    st.markdown(f"**Earlier conversation (summarized):** {st.session_state.conversation.summary}")
+                for message in st.session_state.conversation.turns:
                     if message['sender'] == 'user':
                         st.markdown(f"**You:** {message['text']}")
                     else:
@@ -267,20 +309,24 @@ def main():
 
         if submit_button:
             if user_input:
-                st.session_state.conversation.append({'sender': 'user', 'text': user_input})
+                memory = st.session_state.conversation
+                history = memory.context()
 
                 with st.spinner("Generating response..."):
                     if st.session_state.uploaded_data is not None:
                         data_analyzer = DataAnalyzer(st.session_state.uploaded_data, llm)
-                        response_text = data_analyzer.process_question(user_input)
+                        response = data_analyzer.process_question(user_input, stream=True, history=history)
                     else:
-                        conversation = [{'sender': 'user', 'text': user_input}]
-                        response = llm.conversational_response(conversation)
-                        response_text = response['text']
-
-                st.session_state.conversation.append({'sender': 'assistant', 'text': response_text})
+                        conversation = history + [{'sender': 'user', 'text': user_input}]
+                        response = llm.stream_conversational_response(conversation)
+
+                st.markdown("**Assistant:**")
+                st.write_stream(response)
+                response_text = response.result()['text']
+                memory.add('user', user_input)
+                memory.add('assistant', response_text)
+                memory.compact(llm)
                 st.success("Response received!")
-                st.write(f"**Assistant:** {response_text}")
 
     elif page_to_display == "📊 Data Insights":
         st.header("Data Insights and Visualization")
@@ -293,15 +339,18 @@ def main():
             st.write(data.head())
 
             st.subheader("Numeric Column Statistics")
-            numeric_stats = data.describe().transpose()
+            numeric_stats = DatasetProfile.for_dataset(data).numeric_summary()
             st.table(numeric_stats)
 
+            # Every LLM-backed section reserves its place on the page; the prompts are sent together at the end.
+            pending = []
             st.subheader("Automated Trend Analysis")
-            trend_insights = data_analyzer.automated_trend_analysis()
-            st.write(trend_insights)
+            trend_placeholder = st.empty()
+            trend_placeholder.caption("Analyzing trends...")
+            pending.append((trend_placeholder, data_analyzer.trend_prompt()))
 
             st.subheader("Time Series Analysis")
-            data_analyzer.time_series_analysis()
+            data_analyzer.time_series_analysis(pending)
 
             st.subheader("Interactive Data Visualization")
             columns = data.columns.tolist()
@@ -314,11 +363,21 @@ def main():
 
             st.subheader("Segment Analysis")
             segment_column = st.selectbox("Select Segment Column", columns)
-            segment_insights = data_analyzer.segment_analysis(segment_column)
-            st.write(segment_insights)
+            segment_metric = st.selectbox("Rank Segments By", ["Row count"] + data.select_dtypes(include='number').columns.tolist())
+            segment_prompt, segment_message = data_analyzer.segment_prompt(segment_column, None if segment_metric == "Row count" else segment_metric)
+            if segment_prompt:
+                segment_placeholder = st.empty()
+                segment_placeholder.caption("Comparing segments...")
+                pending.append((segment_placeholder, segment_prompt))
+            else:
+                st.write(segment_message)
 
             st.subheader("Key Findings Summary")
-            data_analyzer.key_findings_summary()
+            findings_placeholder = st.empty()
+            findings_placeholder.caption("Summarizing key findings...")
+            pending.append((findings_placeholder, data_analyzer.key_findings_prompt()))
+
+            data_analyzer.write_responses(pending)
         else:
             st.write("Please upload a dataset in the Q&A System page to view insights.")
 
@@ -339,19 +398,14 @@ def main():
             if st.button("Generate AI-Powered Strategies"):
                 with st.spinner("Analyzing data and generating strategies..."):
                     
-                    data_summary_df = data.describe(include='all').transpose().round(2)
-                    data_summary = data_summary_df.to_string()
-
-                    
-                    max_length = 1500 
-                    if len(data_summary) > max_length:
-                        data_summary = data_summary[:max_length] + "\n... [Data truncated]"
+                    data_summary = DatasetProfile.for_dataset(data).pack_summary(value_counts=False, decimals=2)
 
-                    strategies = llm.generate_strategic_recommendations(data_summary)
-                    st.session_state['strategies'] = strategies
-                    st.session_state['risk_analysis'] = None  
-                    st.session_state['resource_estimates'] = None
-                    st.write(f"**AI Strategy Suggestions:**\n{strategies}")
+                st.write("**AI Strategy Suggestions:**")
+                strategies = llm.generate_strategic_recommendations(data_summary, stream=True)
+                st.write_stream(strategies)
+                st.session_state['strategies'] = strategies.result()['text']
+                st.session_state['risk_analysis'] = None  
+                st.session_state['resource_estimates'] = None
 
             
             if st.session_state['strategies']:
@@ -383,13 +437,13 @@ def main():
             company_data = st.session_state.financial_data
 
             if st.button("Generate AI-Powered Strategies"):
-                with st.spinner("Analyzing financial data and generating strategies..."):
-                    data_summary = company_data.to_string()
-                    strategies = llm.generate_strategic_recommendations(data_summary)
-                    st.session_state['strategies'] = strategies
-                    st.session_state['risk_analysis'] = None  
-                    st.session_state['resource_estimates'] = None
-                st.write(f"**AI Strategy Suggestions:**\n{strategies}")
+                data_summary = company_data.to_string()
+                st.write("**AI Strategy Suggestions:**")
+                strategies = llm.generate_strategic_recommendations(data_summary, stream=True)
+                st.write_stream(strategies)
+                st.session_state['strategies'] = strategies.result()['text']
+                st.session_state['risk_analysis'] = None  
+                st.session_state['resource_estimates'] = None
 
             if st.session_state['strategies']:
                 strategies = st.session_state['strategies']
@@ -427,11 +481,7 @@ def main():
                 with st.spinner("Simulating strategy..."):
                     data_or_company = st.session_state.uploaded_data if st.session_state.uploaded_data is not None else st.session_state.financial_data
                     if data_or_company is not None:
-                        data_summary_df = data_or_company.describe(include='all').transpose().round(2)
-                        data_summary = data_summary_df.to_string()
-                        max_length = 1500  
-                        if len(data_summary) > max_length:
-                            data_summary = data_summary[:max_length] + "\n... [Data truncated]"
+                        data_summary = DatasetProfile.for_dataset(data_or_company).pack_summary(value_counts=False, decimals=2)
                     else:
                         data_summary = "No data available."
                     simulation_result = llm.simulate_custom_strategy(custom_strategy_input, data_summary)
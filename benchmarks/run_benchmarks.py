@@ -0,0 +1,187 @@
+"""End-to-end benchmarks for the data, metric and strategy compute paths.
+
+Runs every stage against the bundled Supermart dataset and against synthetic
+copies scaled to larger row counts, with the LLM replaced by the offline stub
+backend. Each stage reports wall time, peak traced memory, net allocated
+blocks and the process's maximum RSS as JSON, so runs can be diffed. Every
+per-dataset cache is cleared before each stage, so stages are timed cold and
+independently of the order they run in.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --scales base,1000000,10000000 --output bench.json
+    python benchmarks/run_benchmarks.py --stages profile,segment_analysis --no-tracemalloc
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('LLM_BACKEND', 'stub')
+os.environ.setdefault('LLM_CACHE_ENABLED', '0')
+
+import numpy as np
+import pandas as pd
+from modules.llm_interface import LLMInterface
+from modules.llm_backends import StubBackend
+from modules.llm_cache import NullCache
+from modules.data_loader import ChunkedCSVLoader
+from modules.dataset_store import register_fingerprint
+from modules.dataset_profile import DatasetProfile
+from modules.rollup_cube import RollupCube
+from modules.segment_index import SegmentIndex
+from modules.query_engine import QueryEngine
+from modules.forecasting import ForecastEngine
+from modules.anomaly_detection import MetricAnomalies
+from modules.correlation import DatasetCorrelation
+from modules.date_detection import DateColumns
+from modules.business_data_handler import DataAnalyzer
+from modules.metric_tracker import MetricTracker
+from modules.strategy_map import StrategyMap
+
+DATASET_PATH = os.path.join(ROOT, 'data', 'Supermart Grocery Sales - Retail Analytics Dataset.csv')
+# Canned query plan returned by the stub whenever the local query engine asks for one.
+QUESTION_PLAN = {
+    'filters': [{'column': 'Order Date', 'op': 'between', 'value': ['2018-10-01', '2018-12-31']}],
+    'groupby': ['Category'],
+    'aggregations': [{'column': 'Sales', 'func': 'sum', 'as': 'total_sales'}],
+    'sort': [{'column': 'total_sales', 'descending': True}],
+    'limit': 5,
+}
+
+
+# Classes that memoize derived views per dataset; cleared before every stage so each one is timed cold.
+PER_DATASET_CACHES = (DatasetProfile, DateColumns, RollupCube, SegmentIndex, QueryEngine, ForecastEngine,
+                      MetricAnomalies, DatasetCorrelation)
+
+
+def clear_caches():
+    for cls in PER_DATASET_CACHES:
+        with cls._lock:
+            cls._cache.clear()
+
+
+def scale_dataset(base, rows, seed=0):
+    """Builds a synthetic dataset of the requested size by resampling rows and jittering numeric values."""
+    rng = np.random.default_rng(seed)
+    data = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+    for col in data.select_dtypes(include='number').columns:
+        data[col] = data[col] * rng.normal(1.0, 0.05, rows)
+    if 'Order ID' in data.columns:
+        data['Order ID'] = "OD" + pd.Series(np.arange(1, rows + 1)).astype(str)
+    return data
+
+
+def build_stages(data, llm):
+    numeric_cols = data.select_dtypes(include='number').columns.tolist()
+    metric = numeric_cols[0]
+    segment_column = 'Category' if 'Category' in data.columns else data.columns[0]
+    analyzer = DataAnalyzer(data, llm)
+    tracker = MetricTracker(llm, data)
+    strategy_map = StrategyMap(data, llm)
+    return {
+        'profile': lambda: DatasetProfile.for_dataset(data),
+        'rollup_cube': lambda: RollupCube.for_dataset(data),
+        'generate_insights': analyzer.generate_insights,
+        'automated_trend_analysis': analyzer.automated_trend_analysis,
+        'segment_analysis': lambda: analyzer.segment_analysis(segment_column, metric),
+        'segment_high_cardinality': lambda: analyzer.segment_analysis('Order ID' if 'Order ID' in data.columns else segment_column, metric),
+        'time_series_analysis': analyzer.time_series_analysis,
+        'process_question': lambda: analyzer.process_question("What was our top-selling category in the last quarter?"),
+        'key_findings_summary': analyzer.key_findings_summary,
+        'correlation': lambda: tracker.compute_correlations().top_pairs(),
+        'forecast': lambda: tracker.fit_forecast(6),
+        'anomalies': lambda: tracker.find_anomalies(metric),
+        'strategy_scenarios': lambda: strategy_map.generate_scenarios("Increase marketing spend by 20% targeting young adults."),
+    }
+
+
+def measure(func, trace_memory=True):
+    """Runs func once and returns its wall time, peak traced memory, net allocated blocks and max RSS."""
+    if trace_memory:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    result = {'wall_seconds': round(elapsed, 6)}
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        diff = after.compare_to(before, 'filename')
+        result['peak_traced_bytes'] = peak
+        result['net_allocated_blocks'] = sum(stat.count_diff for stat in diff)
+        result['net_allocated_bytes'] = sum(stat.size_diff for stat in diff)
+    result['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, stage_names, trace_memory, seed):
+    llm = LLMInterface(cache=NullCache(), backend=StubBackend(latency=0.0, responses={'JSON query plan': json.dumps(QUESTION_PLAN)}))
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'trace_memory': trace_memory,
+        'results': [],
+    }
+
+    load_stats = measure(lambda: ChunkedCSVLoader().load(DATASET_PATH), trace_memory)
+    report['results'].append({'scale': 'base', 'rows': None, 'stage': 'load_csv', **load_stats})
+    base = ChunkedCSVLoader().load(DATASET_PATH)
+
+    for scale in scales:
+        data = base if scale == 'base' else scale_dataset(base, int(scale), seed)
+        register_fingerprint(data, f"benchmark-{scale}-{seed}")
+        stages = build_stages(data, llm)
+        for name in stage_names or stages:
+            clear_caches()
+            stats = measure(stages[name], trace_memory)
+            entry = {'scale': scale, 'rows': len(data), 'stage': name, **stats}
+            report['results'].append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+        del data, stages
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='base,1000000', help="Comma-separated row counts, 'base' for the bundled dataset.")
+    parser.add_argument('--stages', default=None, help="Comma-separated stage names (default: all).")
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-tracemalloc', action='store_true', help="Skip memory tracing for cleaner wall times.")
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    stage_names = [name.strip() for name in args.stages.split(',')] if args.stages else None
+    report = run(scales, stage_names, not args.no_tracemalloc, args.seed)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# modules/anomaly_detection.py
+
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+from modules.date_detection import DateColumns, parse_dates
+
+DETECTORS = ['robust_z', 'ewma_z', 'seasonal_z']
+
+
+def _ewma_scores(values, mean, var, seen, alpha, min_periods):
+    """Scores a batch against exponentially weighted mean/variance state and returns the scores and updated state.
+
+    The recursions m_t = (1 - a) m_{t-1} + a x_t and v_t = (1 - a)(v_{t-1} + a (x_t - m_{t-1})^2) are both
+    first-order filters, so each is run for all metrics at once with ewm(adjust=False), seeded with the
+    previous state as the first row.
+    """
+    means = pd.DataFrame(np.vstack([mean, values])).ewm(alpha=alpha, adjust=False, ignore_na=True).mean().to_numpy()
+    deviation = values - means[:-1]
+    variances = pd.DataFrame(np.vstack([var, (1 - alpha) * deviation ** 2])).ewm(
+        alpha=alpha, adjust=False, ignore_na=True
+    ).mean().to_numpy()
+    observed = ~np.isnan(values)
+    seen_before = seen + np.cumsum(observed, axis=0) - observed
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = deviation / np.sqrt(variances[:-1])
+    scores[(seen_before < min_periods) | ~np.isfinite(scores)] = np.nan
+    return scores, means[-1], variances[-1], seen + observed.sum(axis=0)
+
+
+def _block_quartiles(blocks):
+    """Lower quartile, median and upper quartile of each block along axis 1, ignoring NaN, in one sort."""
+    ordered = np.sort(blocks, axis=1)
+    counts = (~np.isnan(blocks)).sum(axis=1)
+    quartiles = []
+    for q in (0.25, 0.5, 0.75):
+        position = np.clip(q * (counts - 1), 0, None)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        low_values = np.take_along_axis(ordered, low[:, None, :], axis=1)[:, 0]
+        high_values = np.take_along_axis(ordered, high[:, None, :], axis=1)[:, 0]
+        quartiles.append(low_values + (high_values - low_values) * (position - low))
+    return quartiles, counts
+
+
+class StreamingAnomalyDetector:
+    """Online anomaly detection for many metrics at once with bounded state per metric.
+
+    Three detectors score every point against state built from earlier points only:
+    - robust_z: distance from the median of the previous complete block of `window` points, scaled by
+      that block's interquartile range;
+    - ewma_z: deviation from an exponentially weighted mean, scaled by the weighted standard deviation;
+    - seasonal_z: the same EWMA residual kept separately per season slot (e.g. weekday), when slots are given.
+    A point is anomalous when any detector's absolute score exceeds `threshold`. Batches passed to
+    update() are scored as a continuation of the stream, so appended rows never rescore history.
+    """
+
+    def __init__(self, metrics, window=None, alpha=None, season_length=7, threshold=None, min_periods=None):
+        self.metrics = list(metrics)
+        self.window = window or int(os.getenv('ANOMALY_WINDOW', 200))
+        self.alpha = alpha or float(os.getenv('ANOMALY_EWMA_ALPHA', 0.05))
+        self.threshold = threshold or float(os.getenv('ANOMALY_THRESHOLD', 3.5))
+        self.min_periods = min_periods or 20
+        self.season_length = season_length
+        m = len(self.metrics)
+        self._pending = np.empty((0, m))
+        self._reference = np.full((2, m), np.nan)
+        self._mean, self._var, self._seen = np.full(m, np.nan), np.full(m, np.nan), np.zeros(m)
+        self._season_mean = np.full((season_length, m), np.nan)
+        self._season_var = np.full((season_length, m), np.nan)
+        self._season_seen = np.zeros((season_length, m))
+
+    def _robust_scores(self, values):
+        # Blocks are aligned on the stream position, so scores do not depend on how rows are batched.
+        combined = np.vstack([self._pending, values])
+        n_blocks = len(combined) // self.window
+        blocks = combined[:n_blocks * self.window].reshape(n_blocks, self.window, combined.shape[1])
+        quartiles, counts = _block_quartiles(blocks)
+        enough = counts >= self.min_periods
+        medians = np.vstack([self._reference[:1], np.where(enough, quartiles[1], np.nan)])
+        iqrs = np.vstack([self._reference[1:], np.where(enough, quartiles[2] - quartiles[0], np.nan)])
+        block_of_row = np.arange(len(self._pending), len(combined)) // self.window
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = (values - medians[block_of_row]) / (iqrs[block_of_row] / 1.349)
+        scores[~np.isfinite(scores)] = np.nan
+        if n_blocks:
+            self._reference = np.vstack([medians[-1:], iqrs[-1:]])
+        self._pending = combined[n_blocks * self.window:]
+        return scores
+
+    def _seasonal_scores(self, values, seasons):
+        scores = np.full(values.shape, np.nan)
+        if seasons is None:
+            return scores
+        seasons = np.asarray(seasons)
+        for slot in np.unique(seasons[seasons >= 0]):
+            rows = seasons == slot
+            scores[rows], self._season_mean[slot], self._season_var[slot], self._season_seen[slot] = _ewma_scores(
+                values[rows], self._season_mean[slot], self._season_var[slot], self._season_seen[slot],
+                self.alpha, self.min_periods
+            )
+        return scores
+
+    def update(self, frame, seasons=None):
+        """Scores a batch of rows and folds it into the state; returns per-metric scores and anomaly flags."""
+        values = frame[self.metrics].to_numpy(dtype=float, na_value=np.nan)
+        if not len(values):
+            empty = np.empty((0, len(self.metrics)))
+            return {'score': empty.astype(np.float32), 'anomaly': empty.astype(bool), 'detector': empty.astype(np.int8)}
+        robust = self._robust_scores(values)
+        ewma, self._mean, self._var, self._seen = _ewma_scores(
+            values, self._mean, self._var, self._seen, self.alpha, self.min_periods
+        )
+        seasonal = self._seasonal_scores(values, seasons)
+        robust, ewma, seasonal = np.abs(robust), np.abs(ewma), np.abs(seasonal)
+        score = np.nan_to_num(np.fmax(np.fmax(robust, ewma), seasonal), nan=0.0)
+        detector = np.where(robust == score, 0, np.where(ewma == score, 1, 2)).astype(np.int8)
+        return {'score': score.astype(np.float32), 'anomaly': score > self.threshold, 'detector': detector}
+
+
+class MetricAnomalies:
+    """Streams a dataset through a StreamingAnomalyDetector once and keeps the scores, cached per dataset."""
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 4
+
+    def __init__(self, data, chunksize=1_000_000):
+        self.metrics = data.select_dtypes(include='number').columns.tolist()
+        self.detector = StreamingAnomalyDetector(self.metrics)
+        detected = DateColumns.for_dataset(data)
+        self.date_column = next(iter(detected.columns), None)
+        self.date_formats = detected.formats.get(self.date_column)
+        weekdays = self._weekdays(detected.columns[self.date_column]) if self.date_column else None
+        self.index = data.index[:0]
+        self._scores, self._flags, self._detectors = [], [], []
+        for start in range(0, len(data), chunksize):
+            chunk_weekdays = None if weekdays is None else weekdays[start:start + chunksize]
+            self._record(data.iloc[start:start + chunksize], chunk_weekdays)
+
+    @staticmethod
+    def _weekdays(dates):
+        days = dates.to_numpy().astype('datetime64[D]')
+        weekdays = (days.astype(np.int64) + 3) % 7
+        return np.where(np.isnat(days), -1, weekdays)
+
+    def _record(self, frame, weekdays):
+        result = self.detector.update(frame, weekdays)
+        self.index = self.index.append(frame.index)
+        self._scores.append(result['score'])
+        self._flags.append(result['anomaly'])
+        self._detectors.append(result['detector'])
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached scores for a dataset, streaming it through the detectors on first use."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            anomalies = cls._cache.get(fingerprint)
+            if anomalies is not None:
+                cls._cache.move_to_end(fingerprint)
+                return anomalies
+        anomalies = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = anomalies
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return anomalies
+
+    def append(self, rows):
+        """Scores newly arrived rows as a continuation of the stream, without revisiting earlier rows."""
+        weekdays = None
+        if self.date_column in rows.columns:
+            dates = rows[self.date_column]
+            if self.date_formats:
+                dates = parse_dates(dates.astype(object), self.date_formats)
+            weekdays = self._weekdays(pd.to_datetime(dates, errors='coerce'))
+        self._record(rows, weekdays)
+
+    @property
+    def scores(self):
+        return pd.DataFrame(np.concatenate(self._scores), index=self.index, columns=self.metrics)
+
+    @property
+    def flags(self):
+        return pd.DataFrame(np.concatenate(self._flags), index=self.index, columns=self.metrics)
+
+    def anomalies(self, metric):
+        """Returns the flagged rows of one metric with their score and the detector that fired strongest."""
+        column = self.metrics.index(metric)
+        flags = np.concatenate([chunk[:, column] for chunk in self._flags])
+        scores = np.concatenate([chunk[:, column] for chunk in self._scores])[flags]
+        detectors = np.concatenate([chunk[:, column] for chunk in self._detectors])[flags]
+        return pd.DataFrame({
+            'score': scores,
+            'detector': np.asarray(DETECTORS)[detectors],
+        }, index=self.index[flags])
+
+    def summary(self):
+        """Counts anomalies per metric and detector."""
+        detectors = np.concatenate(self._detectors)
+        flags = np.concatenate(self._flags)
+        counts = {
+            name: (flags & (detectors == position)).sum(axis=0)
+            for position, name in enumerate(DETECTORS)
+        }
+        table = pd.DataFrame(counts, index=self.metrics)
+        table.insert(0, 'anomalies', flags.sum(axis=0))
+        return table
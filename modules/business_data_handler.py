@@ -6,6 +6,13 @@ import seaborn as sns
 import streamlit as st
 import numpy as np
 import plotly.express as px
+from modules.dataset_profile import DatasetProfile
+from modules.prompt_packer import PromptPacker
+from modules.date_detection import DateColumns
+from modules.rollup_cube import RollupCube, FREQUENCIES
+from modules.segment_index import SegmentIndex
+from modules.query_engine import QueryEngine
+from modules.downsampling import DEFAULT_MAX_POINTS, downsample_frame, evenly_spaced
 
 class DataAnalyzer:
     def __init__(self, data, llm):
@@ -23,121 +30,160 @@ class DataAnalyzer:
             col_unique = self.data[column].nunique()
             insights.append(f"- **{column}** (Type: {col_type}, Unique values: {col_unique})")
 
-        numeric_cols = self.data.select_dtypes(include='number').columns
-        if len(numeric_cols) > 0:
+        stats_summary = DatasetProfile.for_dataset(self.data).numeric_summary()
+        if not stats_summary.empty:
             insights.append("\n### Numeric Column Statistics:")
-            stats_summary = self.data[numeric_cols].describe().T
             insights.append(stats_summary.to_string())
 
         return "\n".join(insights)
 
+    def _respond(self, prompt):
+        return self.llm.conversational_response([{'sender': 'user', 'text': prompt}])['text']
+
+    def write_responses(self, pending):
+        """Sends the prompts of (placeholder, prompt) pairs concurrently and writes each answer as it arrives."""
+        for index, response in self.llm.map_responses([prompt for _, prompt in pending]):
+            pending[index][0].write(response)
+
+    def trend_prompt(self):
+        data_summary = DatasetProfile.for_dataset(self.data).numeric_summary().round(2).to_string()
+        return f"Based on the following data summary, provide insights on any noticeable trends or patterns:\n{data_summary}"
+
     def automated_trend_analysis(self):
         """Uses LLM to analyze trends in the data."""
-        numeric_cols = self.data.select_dtypes(include='number').columns.tolist()
-        data_summary = self.data[numeric_cols].describe().transpose().round(2).to_string()
-        prompt = f"Based on the following data summary, provide insights on any noticeable trends or patterns:\n{data_summary}"
-        response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])['text']
-        return response
+        return self._respond(self.trend_prompt())
 
     def generate_interactive_visualization(self, x_axis, y_axis, chart_type):
         """Generates interactive visualizations based on user selections."""
+        plot_data = self._chart_data(x_axis, y_axis, chart_type)
         if chart_type == "Line Chart":
-            fig = px.line(self.data, x=x_axis, y=y_axis, title=f"{y_axis} over {x_axis}")
+            fig = px.line(plot_data, x=x_axis, y=y_axis, title=f"{y_axis} over {x_axis}")
         elif chart_type == "Bar Chart":
-            fig = px.bar(self.data, x=x_axis, y=y_axis, title=f"{y_axis} by {x_axis}")
+            fig = px.bar(plot_data, x=x_axis, y=y_axis, title=f"{y_axis} by {x_axis}")
         elif chart_type == "Scatter Plot":
-            fig = px.scatter(self.data, x=x_axis, y=y_axis, title=f"{y_axis} vs {x_axis}")
+            fig = px.scatter(plot_data, x=x_axis, y=y_axis, title=f"{y_axis} vs {x_axis}")
         else:
             fig = None
         return fig
 
-    def segment_analysis(self, segment_column):
-        """Analyzes data by segments and provides insights."""
+    def _chart_data(self, x_axis, y_axis, chart_type):
+        """Returns the rows to send to the browser, downsampling or aggregating selections above the point threshold."""
+        plot_data = self.data[list(dict.fromkeys([x_axis, y_axis]))]
+        if len(plot_data) <= DEFAULT_MAX_POINTS:
+            return plot_data
+        if x_axis == y_axis or not pd.api.types.is_numeric_dtype(plot_data[y_axis]):
+            return evenly_spaced(plot_data)
+        if chart_type == "Bar Chart":
+            return plot_data.groupby(x_axis, observed=True, sort=False)[y_axis].sum().reset_index()
+        date_columns = DateColumns.for_dataset(self.data).columns
+        if x_axis in date_columns:
+            plot_data = plot_data.assign(**{x_axis: date_columns[x_axis]})
+        plot_data = plot_data.dropna()
+        if pd.api.types.is_numeric_dtype(plot_data[x_axis]) or pd.api.types.is_datetime64_any_dtype(plot_data[x_axis]):
+            plot_data = plot_data.sort_values(x_axis, kind='stable')
+        return downsample_frame(plot_data, x_axis, y_axis, mode='lttb' if chart_type == "Line Chart" else 'minmax')
+
+    def segment_prompt(self, segment_column, metric=None, k=None):
+        """Shows the top segments and returns (prompt, None), or (None, message) when they cannot be analyzed."""
         if segment_column in self.data.columns:
             
             numeric_cols = self.data.select_dtypes(include='number').columns
             if numeric_cols.empty:
-                return "No numeric columns available for analysis."
+                return None, "No numeric columns available for analysis."
 
-            segment_groups = self.data.groupby(segment_column)[numeric_cols].mean().head(5)
+            segment_groups = SegmentIndex.for_dataset(self.data).segment_summary(segment_column, metric, k)
             st.write(segment_groups)
+            ranking = f"total {metric}" if metric else "number of rows"
+            if segment_groups.attrs.get('sketched'):
+                st.caption(f"Top segments estimated with sketches; totals may be overstated by at most {segment_groups.attrs['error_bound']:,.2f}.")
 
-            segment_summary = segment_groups.round(2).to_string()
-            max_length = 1000  
-            if len(segment_summary) > max_length:
-                segment_summary = segment_summary[:max_length] + "\n... [Data truncated]"
+            segment_summary = PromptPacker(budget=PromptPacker.default_budget // 2).add_table(segment_groups.round(2)).pack()
 
             prompt = (
-                f"Analyze the differences between the following segments (showing top 5 segments):\n"
+                f"Analyze the differences between the following segments (showing the top {len(segment_groups)} segments by {ranking}, with average values):\n"
                 f"{segment_summary}\n\n"
                 "Provide insights on the differences between these segments."
             )
-            response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])['text']
-            return response
+            return prompt, None
         else:
-            return "Selected segment column is not in the dataset."
-
-
-
-    def time_series_analysis(self):
-        """Performs time series analysis if date columns are present."""
-        date_columns = self.data.select_dtypes(include=['datetime', 'object']).columns
-        for col in date_columns:
-            try:
-                self.data[col] = pd.to_datetime(self.data[col])
-                time_cols = [col for col in date_columns if pd.api.types.is_datetime64_any_dtype(self.data[col])]
-                if time_cols:
-                    for time_col in time_cols:
-                        numeric_cols = self.data.select_dtypes(include='number').columns
-                        for num_col in numeric_cols:
-                            fig = px.line(self.data, x=time_col, y=num_col, title=f"{num_col} over {time_col}")
-                            st.plotly_chart(fig)
-                            
-                            sample_data = self.data[[time_col, num_col]].dropna().head(100)
-                            data_string = sample_data.to_string(index=False)
-                            max_length = 1000
-                            if len(data_string) > max_length:
-                                data_string = data_string[:max_length] + "\n... [Data truncated]"
-                            prompt = f"Analyze the trend of {num_col} over time based on the following data:\n{data_string}"
-                            response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])['text']
-                            st.write(response)
-                break  
-            except Exception:
-                continue
+            return None, "Selected segment column is not in the dataset."
+
+    def segment_analysis(self, segment_column, metric=None, k=None):
+        """Analyzes the top segments by a metric (or by row count) and provides insights."""
+        prompt, message = self.segment_prompt(segment_column, metric, k)
+        return self._respond(prompt) if prompt else message
+
+
+
+    def time_series_analysis(self, pending=None):
+        """Performs time series analysis if date columns are present.
 
+        When a pending list is given, the (placeholder, prompt) pairs are appended to it for the caller
+        to send together with other prompts instead of being answered here.
+        """
+        date_columns = DateColumns.for_dataset(self.data).columns
+        numeric_cols = self.data.select_dtypes(include='number').columns
+        cube = RollupCube.for_dataset(self.data)
+        if cube.date_column is not None:
+            freq = st.selectbox("Time bucket", FREQUENCIES, index=FREQUENCIES.index('month'), key='time_series_freq')
+            agg = st.selectbox("Aggregate", ['sum', 'mean', 'min', 'max', 'count'], key='time_series_agg')
+        own = [] if pending is None else pending
+        for time_col, dates in date_columns.items():
+            for num_col in numeric_cols:
+                if time_col == cube.date_column:
+                    series_data = cube.series(num_col, freq, agg).rename_axis(time_col).reset_index()
+                    title = f"{num_col} ({agg} per {freq}) over {time_col}"
+                else:
+                    series_data = pd.DataFrame({time_col: dates, num_col: self.data[num_col]}).dropna().sort_values(time_col)
+                    title = f"{num_col} over {time_col}"
+                fig = px.line(downsample_frame(series_data, time_col, num_col), x=time_col, y=num_col, title=title)
+                st.plotly_chart(fig)
+                placeholder = st.empty()
+                placeholder.caption(f"Analyzing the trend of {num_col}...")
+
+                if time_col == cube.date_column:
+                    sample_data, note = series_data.iloc[::-1], " (most recent first)"
+                else:
+                    sample_data, note = series_data.head(100), ""
+                data_string = PromptPacker(budget=PromptPacker.default_budget // 2).add_table(sample_data, index=False).pack()
+                own.append((placeholder, f"Analyze the trend of {num_col} over time based on the following data{note}:\n{data_string}"))
+        if pending is None:
+            self.write_responses(own)
+
+
+    def key_findings_prompt(self):
+        data_summary = DatasetProfile.for_dataset(self.data).pack_summary(value_counts=False, decimals=2)
+        return f"Based on the following data summary, provide a concise summary of key findings:\n{data_summary}"
 
     def key_findings_summary(self):
         """Generates a summary of key findings in the data."""
-        data_summary = self.data.describe(include='all').transpose().round(2).to_string()
-        max_length = 1500  
-        if len(data_summary) > max_length:
-            data_summary = data_summary[:max_length] + "\n... [Data truncated]"
-        prompt = f"Based on the following data summary, provide a concise summary of key findings:\n{data_summary}"
-        response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])['text']
-        st.write(response)
-
-    def process_question(self, question):
-        """Processes the user's question and returns an answer."""
-        
-        data_summary = self.data.describe(include='all').transpose().to_string()
-        
-        categorical_cols = self.data.select_dtypes(include=['object', 'category']).columns
-        value_counts = ""
-        for col in categorical_cols:
-            counts = self.data[col].value_counts().head(10).to_string()
-            value_counts += f"\nColumn '{col}' value counts:\n{counts}\n"
-        
-        max_length = 1500  
-        total_length = len(data_summary) + len(value_counts)
-        if total_length > max_length:
-            data_summary = data_summary[:max_length//2] + "\n... [Data truncated]"
-            value_counts = value_counts[:max_length//2] + "\n... [Data truncated]"
-        prompt = (
-            f"You are an expert data analyst. Use the dataset summary below to provide a detailed answer to the user's question.\n\n"
-            f"Dataset Summary:\n{data_summary}\n\n"
-            f"{value_counts}\n\n"
-            "Remember to reference specific columns and data points in your answer.\n\n"
-            f"Question: {question}"
-        )
-        response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])
+        st.write(self._respond(self.key_findings_prompt()))
+
+    def process_question(self, question, stream=False, history=None):
+        """Processes the user's question, with any earlier conversation as context, and returns an answer or a token stream.
+
+        Questions the model can express as a query plan are computed locally over the full dataset and
+        only the result is sent back for narration; anything else is answered from the dataset summary.
+        """
+        query_context = QueryEngine.for_dataset(self.data).answer_context(question, self.llm, history)
+        if query_context is not None:
+            prompt = (
+                f"You are an expert data analyst. The query below was run over the full dataset to answer the user's question.\n\n"
+                f"{query_context}\n\n"
+                "Answer the question from this result, citing the numbers it contains. Do not invent figures that are not in the result.\n\n"
+                f"Question: {question}"
+            )
+        else:
+            packer = DatasetProfile.for_dataset(self.data).add_to_packer(PromptPacker())
+            data_summary = RollupCube.for_dataset(self.data).add_to_packer(packer).pack()
+            prompt = (
+                f"You are an expert data analyst. Use the dataset summary below to provide a detailed answer to the user's question.\n\n"
+                f"Dataset Summary:\n{data_summary}\n\n"
+                "Remember to reference specific columns and data points in your answer.\n\n"
+                f"Question: {question}"
+            )
+        conversation = list(history or []) + [{'sender': 'user', 'text': prompt}]
+        if stream:
+            return self.llm.stream_conversational_response(conversation)
+        response = self.llm.conversational_response(conversation)
         return response['text']
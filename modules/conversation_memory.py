@@ -0,0 +1,76 @@
+# modules/conversation_memory.py
+
+import os
+from modules.prompt_packer import PromptPacker, count_tokens
+
+
+class ConversationMemory:
+    def __init__(self, token_window=None, summary_tokens=300):
+        self.token_window = token_window or int(os.getenv('CONVERSATION_TOKEN_WINDOW', 1500))
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns = []
+
+    def add(self, sender, text):
+        self.turns.append({'sender': sender, 'text': text, 'tokens': count_tokens(text)})
+
+    def token_count(self):
+        return sum(turn['tokens'] for turn in self.turns)
+
+    def context(self):
+        """Returns the rolling summary and recent turns as messages to send ahead of a new question."""
+        messages = []
+        if self.summary:
+            messages.append({'sender': 'system', 'text': f"Summary of the earlier conversation:\n{self.summary}"})
+        messages.extend({'sender': turn['sender'], 'text': turn['text']} for turn in self.turns)
+        return messages
+
+    def compact(self, llm):
+        """Folds the oldest turns into the rolling summary once the recent turns exceed the token window.
+
+        Turns are only dropped once the summary call succeeds. The two most recent turns are never
+        folded, so any of them too long for its share of the window is truncated instead.
+        """
+        if self.token_count() <= self.token_window:
+            return
+        count, remaining = 0, self.token_count()
+        while len(self.turns) - count > 2 and remaining > self.token_window // 2:
+            remaining -= self.turns[count]['tokens']
+            count += 1
+        if count:
+            self._fold(llm, count)
+        self._truncate_recent()
+
+    def _truncate_recent(self):
+        if self.token_count() <= self.token_window:
+            return
+        share = max(self.token_window // 4, 1)
+        for turn in self.turns[-2:]:
+            if turn['tokens'] > share:
+                text = PromptPacker(budget=share).add_section(turn['text']).pack()
+                if not text:
+                    # A single line longer than the share cannot be cut by lines; keep its start instead.
+                    text = turn['text'][:share * 4] + " ..."
+                turn['text'], turn['tokens'] = text, count_tokens(text)
+
+    def _fold(self, llm, count):
+        folded = self.turns[:count]
+        transcript = "\n".join(
+            f"{'User' if turn['sender'] == 'user' else 'Assistant'}: {turn['text']}" for turn in folded
+        )
+        prompt = (
+            "Update the running summary of a conversation between a user and a data analyst assistant. "
+            "Keep the key facts, figures, conclusions and open questions, and drop pleasantries. "
+            f"Keep the summary under {self.summary_tokens} tokens.\n\n"
+            f"Current summary:\n{self.summary or 'None'}\n\n"
+            f"New turns:\n{transcript}\n\n"
+            "Updated summary:"
+        )
+        summary = llm.generate_response(prompt)
+        if not summary.startswith("Error generating response"):
+            self.summary = summary.strip()
+            del self.turns[:count]
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
@@ -0,0 +1,131 @@
+# modules/correlation.py
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+
+
+class StreamingCorrelation:
+    """Pairwise-complete correlations accumulated chunk by chunk.
+
+    Each chunk's counts, means and co-moments are computed with matrix products on shifted values and
+    merged into the running state with Chan et al.'s parallel update, so the state stays O(columns^2)
+    however many rows arrive and appended rows are folded in without revisiting earlier ones.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.count = np.zeros((p, p))
+        self.mean = np.zeros((p, p))  # mean[i, j]: mean of column i over rows where column j is also present
+        self.m2 = np.zeros((p, p))    # m2[i, j]: sum of squared deviations of column i over the same rows
+        self.comoment = np.zeros((p, p))
+
+    def update(self, frame):
+        values = frame[self.columns].to_numpy(dtype=float, na_value=np.nan)
+        if not len(values):
+            return self
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore'):
+            shift = np.nan_to_num(np.nanmean(values, axis=0))
+        shifted = np.where(present, values - shift, 0.0)
+        mask = present.astype(float)
+
+        count = mask.T @ mask
+        sums = shifted.T @ mask
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, sums / count, 0.0)
+        m2 = (shifted ** 2).T @ mask - mean * sums
+        comoment = shifted.T @ shifted - mean * sums.T
+        mean = mean + shift[:, None]
+
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, self.count * count / total, 0.0)
+            delta = mean - self.mean
+            self.m2 = self.m2 + m2 + delta ** 2 * weight
+            self.comoment = self.comoment + comoment + delta * delta.T * weight
+            self.mean = self.mean + np.where(total > 0, delta * count / total, 0.0)
+        self.count = total
+        return self
+
+    def matrix(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def pairs(self, level=0.95):
+        """Every column pair with its correlation, observation count, Fisher-z p-value and confidence interval."""
+        i, j = np.triu_indices(len(self.columns), k=1)
+        r = self.matrix().to_numpy()[i, j]
+        n = self.count[i, j]
+        z = np.arctanh(np.clip(r, -0.999999, 0.999999))
+        se = 1.0 / np.sqrt(np.maximum(n - 3, 1))
+        critical = NormalDist().inv_cdf(0.5 + level / 2)
+        table = pd.DataFrame({
+            'metric_a': np.asarray(self.columns, dtype=object)[i],
+            'metric_b': np.asarray(self.columns, dtype=object)[j],
+            'correlation': r,
+            'n': n.astype(np.int64),
+            'p_value': [math.erfc(abs(value) / math.sqrt(2)) for value in z / se],
+            'ci_low': np.tanh(z - critical * se),
+            'ci_high': np.tanh(z + critical * se),
+        })
+        return table.dropna(subset=['correlation'])
+
+    def top_pairs(self, k=None, alpha=0.05):
+        """The k strongest positive and k strongest negative pairs that are significant at alpha."""
+        k = k or int(os.getenv('CORRELATION_TOP_K', 5))
+        table = self.pairs()
+        table = table[table['p_value'] < alpha]
+        positive = table[table['correlation'] > 0].nlargest(k, 'correlation')
+        negative = table[table['correlation'] < 0].nsmallest(k, 'correlation')
+        return positive.reset_index(drop=True), negative.reset_index(drop=True)
+
+    def clustered_matrix(self, max_columns=None):
+        """Correlation matrix limited to the most strongly correlated columns and ordered so related ones sit together."""
+        max_columns = max_columns or int(os.getenv('CORRELATION_HEATMAP_MAX', 30))
+        corr = self.matrix()
+        strength = corr.abs().where(~np.eye(len(corr), dtype=bool)).max().fillna(0.0)
+        keep = strength.nlargest(max_columns).index
+        corr = corr.loc[keep, keep]
+        # Spectral ordering: the leading eigenvector of |corr| only ranks overall strength, the second one
+        # splits the columns into groups, so sorting by it places correlated blocks next to each other.
+        _, vectors = np.linalg.eigh(np.nan_to_num(corr.abs().to_numpy()))
+        order = np.argsort(vectors[:, -2], kind='stable') if len(corr) > 2 else np.arange(len(corr))
+        return corr.iloc[order, order]
+
+
+class DatasetCorrelation:
+    """Streams a dataset's numeric columns through StreamingCorrelation once, cached per dataset."""
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 4
+
+    def __init__(self, data, chunksize=200_000):
+        self.engine = StreamingCorrelation(data.select_dtypes(include='number').columns)
+        for start in range(0, len(data), chunksize):
+            self.engine.update(data.iloc[start:start + chunksize])
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached correlation state for a dataset, computing it on first use."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            correlation = cls._cache.get(fingerprint)
+            if correlation is not None:
+                cls._cache.move_to_end(fingerprint)
+                return correlation.engine
+        correlation = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = correlation
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return correlation.engine
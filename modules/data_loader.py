@@ -0,0 +1,112 @@
+# modules/data_loader.py
+
+import os
+import numpy as np
+import pandas as pd
+
+
+class ChunkedCSVLoader:
+    def __init__(self, chunksize=250_000, sample_rows=20_000, category_ratio=0.5, max_categories=100_000):
+        self.chunksize = chunksize
+        self.sample_rows = sample_rows
+        self.category_ratio = category_ratio
+        self.max_categories = max_categories
+
+    def infer_dtypes(self, sample):
+        """Infers a compact storage kind for each column from a sample of rows."""
+        kinds = {}
+        for col in sample.columns:
+            series = sample[col]
+            if pd.api.types.is_bool_dtype(series):
+                kinds[col] = 'bool'
+            elif pd.api.types.is_integer_dtype(series):
+                kinds[col] = 'integer'
+            elif pd.api.types.is_numeric_dtype(series):
+                kinds[col] = 'float'
+            else:
+                non_null = series.dropna()
+                unique_ratio = non_null.nunique() / max(len(non_null), 1)
+                kinds[col] = 'category' if unique_ratio <= self.category_ratio else 'object'
+        return kinds
+
+    def load(self, source, progress_callback=None):
+        """Reads a CSV in chunks and assembles a compact DataFrame column by column."""
+        handle, total_bytes, close_handle = self._open(source)
+        try:
+            sample = pd.read_csv(handle, nrows=self.sample_rows)
+            kinds = self.infer_dtypes(sample)
+            columns = sample.columns.tolist()
+            del sample
+            handle.seek(0)
+
+            pieces = {col: [] for col in columns}
+            categories = {col: {} for col in columns if kinds[col] == 'category'}
+            rows_loaded = 0
+
+            for chunk in pd.read_csv(handle, chunksize=self.chunksize, dtype={col: object for col in categories}):
+                for col in columns:
+                    kind = kinds[col]
+                    if kind == 'category':
+                        codes = self._encode_categories(chunk[col], categories[col])
+                        if len(categories[col]) > self.max_categories:
+                            pieces[col] = [self._decode_categories(c, categories[col]) for c in pieces[col]]
+                            pieces[col].append(self._decode_categories(codes, categories[col]))
+                            kinds[col] = 'object'
+                            del categories[col]
+                        else:
+                            pieces[col].append(codes)
+                    elif kind in ('integer', 'float'):
+                        try:
+                            values = pd.to_numeric(chunk[col], downcast='integer' if kind == 'integer' else None)
+                            pieces[col].append(values.to_numpy())
+                        except (ValueError, TypeError):
+                            pieces[col] = [np.asarray(p, dtype=object) for p in pieces[col]]
+                            pieces[col].append(chunk[col].to_numpy(dtype=object))
+                            kinds[col] = 'object'
+                    else:
+                        pieces[col].append(chunk[col].to_numpy())
+                rows_loaded += len(chunk)
+                del chunk
+
+                if progress_callback is not None:
+                    fraction = handle.tell() / total_bytes if total_bytes else 0.0
+                    progress_callback(min(fraction, 1.0), rows_loaded)
+
+            data = {}
+            for col in columns:
+                column_pieces = pieces.pop(col)
+                values = np.concatenate(column_pieces) if column_pieces else np.array([])
+                del column_pieces
+                if kinds[col] == 'category':
+                    values = pd.Categorical.from_codes(values, categories=list(categories.pop(col)))
+                data[col] = values
+            return pd.DataFrame(data, columns=columns, copy=False)
+        finally:
+            if close_handle:
+                handle.close()
+
+    def _open(self, source):
+        """Returns a binary file handle, its size in bytes and whether the loader owns it."""
+        if isinstance(source, (str, os.PathLike)):
+            return open(source, 'rb'), os.path.getsize(source), True
+        source.seek(0)
+        total_bytes = getattr(source, 'size', None)
+        if total_bytes is None:
+            source.seek(0, os.SEEK_END)
+            total_bytes = source.tell()
+            source.seek(0)
+        return source, total_bytes, False
+
+    def _encode_categories(self, series, mapping):
+        """Maps a chunk's values onto the global category codes, growing the mapping as needed."""
+        local = pd.Categorical(series)
+        for value in local.categories:
+            if value not in mapping:
+                mapping[value] = len(mapping)
+        lookup = np.array([mapping[value] for value in local.categories] + [-1], dtype=np.int32)
+        return lookup[local.codes]
+
+    def _decode_categories(self, codes, mapping):
+        """Turns category codes back into an object array of values."""
+        values = np.array(list(mapping) + [np.nan], dtype=object)
+        return values[codes]
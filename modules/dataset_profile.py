@@ -0,0 +1,144 @@
+# modules/dataset_profile.py
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+from modules.prompt_packer import PromptPacker
+
+STAT_COLUMNS = ['count', 'unique', 'top', 'freq', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+NUMERIC_STATS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+class DatasetProfile:
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 8
+
+    def __init__(self, data, top_n=10):
+        self.fingerprint = dataset_fingerprint(data)
+        self.n_rows, self.n_cols = data.shape
+        self.columns = data.columns.tolist()
+        self.dtypes = data.dtypes.to_dict()
+        self.top_n = top_n
+        self.stats = {}
+        self.value_counts = {}
+        self.kinds = {}
+        for col in self.columns:
+            series = data[col]
+            if pd.api.types.is_bool_dtype(series) or not (
+                pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series)
+            ):
+                self._profile_categorical(col, series)
+            elif pd.api.types.is_datetime64_any_dtype(series):
+                self._profile_datetime(col, series)
+            else:
+                self._profile_numeric(col, series)
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached profile for a dataset, computing it on first use."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            profile = cls._cache.get(fingerprint)
+            if profile is not None:
+                cls._cache.move_to_end(fingerprint)
+                return profile
+        profile = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = profile
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return profile
+
+    def _profile_numeric(self, col, series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        values = values[~np.isnan(values)]
+        stats = {'count': float(values.size)}
+        if values.size:
+            quantiles = np.percentile(values, [0, 25, 50, 75, 100])
+            stats.update({
+                'mean': values.mean(),
+                'std': values.std(ddof=1) if values.size > 1 else np.nan,
+                'min': quantiles[0], '25%': quantiles[1], '50%': quantiles[2],
+                '75%': quantiles[3], 'max': quantiles[4],
+            })
+        self.stats[col] = stats
+        self.kinds[col] = 'numeric'
+
+    def _profile_datetime(self, col, series):
+        values = series.dropna()
+        stats = {'count': float(len(values))}
+        if len(values):
+            stats.update({'mean': values.mean(), 'min': values.min(), 'max': values.max()})
+        self.stats[col] = stats
+        self.kinds[col] = 'datetime'
+
+    def _profile_categorical(self, col, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+            counts = pd.Series(counts, index=series.cat.categories)
+            counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        else:
+            counts = series.value_counts()
+        stats = {'count': float(counts.sum()), 'unique': float(len(counts))}
+        if len(counts):
+            stats.update({'top': counts.index[0], 'freq': float(counts.iloc[0])})
+        self.stats[col] = stats
+        self.kinds[col] = 'categorical'
+        self.value_counts[col] = counts.head(self.top_n)
+
+    def numeric_columns(self):
+        return [col for col in self.columns if self.kinds[col] == 'numeric']
+
+    def categorical_columns(self):
+        return [col for col in self.columns if self.kinds[col] == 'categorical']
+
+    def column_value(self, col):
+        """Scores how much a column's statistics tell the model, from near 0 for constant or ID-like columns up to 1."""
+        stats = self.stats[col]
+        count = stats.get('count', 0)
+        if not count:
+            return 0.0
+        if self.kinds[col] == 'categorical':
+            if stats['unique'] <= 1 or stats['unique'] >= 0.9 * count:
+                return 0.1
+            return 0.3 + 0.3 * (1 - stats['freq'] / count)
+        if self.kinds[col] == 'datetime':
+            return 0.9
+        std, mean = stats.get('std', np.nan), stats.get('mean', np.nan)
+        if not np.isfinite(std) or std == 0:
+            return 0.1
+        return 0.6 + 0.4 * min(abs(std / mean), 1.0) if mean else 1.0
+
+    def describe_table(self):
+        """Equivalent of describe(include='all').transpose() built from the cached statistics."""
+        table = pd.DataFrame.from_dict(self.stats, orient='index').reindex(index=self.columns, columns=STAT_COLUMNS)
+        return table.dropna(axis=1, how='all')
+
+    def numeric_summary(self):
+        """Equivalent of describe().transpose() restricted to numeric columns."""
+        return pd.DataFrame.from_dict(
+            {col: self.stats[col] for col in self.numeric_columns()}, orient='index'
+        ).reindex(columns=NUMERIC_STATS).astype(float)
+
+    def pack_summary(self, budget=None, value_counts=True, decimals=None):
+        """Packs the summary table and value counts into a token budget, most informative columns first."""
+        return self.add_to_packer(PromptPacker(budget=budget), value_counts, decimals).pack()
+
+    def add_to_packer(self, packer, value_counts=True, decimals=None):
+        """Adds the row count, ranked summary table and value counts to a prompt packer."""
+        packer.add_section(f"Rows: {self.n_rows}, Columns: {self.n_cols}", priority=2.0)
+        ranked = sorted(self.columns, key=self.column_value, reverse=True)
+        table = self.describe_table().loc[ranked]
+        if decimals is not None:
+            table = table.round(decimals)
+        packer.add_table(table, priority=1.5)
+        if value_counts:
+            for col in ranked:
+                if self.kinds[col] == 'categorical':
+                    text = "\n".join(f"{value}: {count}" for value, count in self.value_counts[col].items())
+                    packer.add_section(text, priority=self.column_value(col), title=f"Column '{col}' value counts:")
+        return packer
@@ -0,0 +1,82 @@
+# modules/dataset_store.py
+
+import hashlib
+import os
+import weakref
+import pandas as pd
+import pyarrow as pa
+
+_fingerprints = {}
+
+
+def register_fingerprint(data, fingerprint):
+    """Associates a content fingerprint with a DataFrame for as long as the frame is alive."""
+    key = id(data)
+    ref = weakref.ref(data, lambda _ref, key=key: _fingerprints.pop(key, None))
+    _fingerprints[key] = (ref, fingerprint)
+
+
+def dataset_fingerprint(data):
+    """Returns the fingerprint of a DataFrame, hashing its contents once if it is not registered."""
+    entry = _fingerprints.get(id(data))
+    if entry is not None and entry[0]() is data:
+        return entry[1]
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, data.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    fingerprint = digest.hexdigest()
+    register_fingerprint(data, fingerprint)
+    return fingerprint
+
+
+class DatasetStore:
+    def __init__(self, root=None):
+        self.root = root or os.getenv('DATASET_STORE_DIR', '.dataset_store')
+        os.makedirs(self.root, exist_ok=True)
+
+    def content_hash(self, source, block_size=1 << 20):
+        """Hashes an uploaded file or path in blocks without reading it into memory at once."""
+        digest = hashlib.sha256()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as handle:
+                for block in iter(lambda: handle.read(block_size), b''):
+                    digest.update(block)
+        else:
+            source.seek(0)
+            for block in iter(lambda: source.read(block_size), b''):
+                digest.update(block)
+            source.seek(0)
+        return digest.hexdigest()
+
+    def path_for(self, fingerprint):
+        return os.path.join(self.root, f"{fingerprint}.arrow")
+
+    def contains(self, fingerprint):
+        return os.path.exists(self.path_for(fingerprint))
+
+    def save(self, fingerprint, data):
+        """Writes a DataFrame to the store as an uncompressed Arrow IPC file."""
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        path = self.path_for(fingerprint)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    def load(self, fingerprint):
+        """Memory-maps a stored dataset and returns it as a DataFrame backed by the mapped buffers."""
+        source = pa.memory_map(self.path_for(fingerprint), 'r')
+        table = pa.ipc.open_file(source).read_all()
+        data = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        register_fingerprint(data, fingerprint)
+        return data
+
+    def ingest(self, source, loader, progress_callback=None):
+        """Stores an upload under its content hash, parsing it only if that content is new."""
+        fingerprint = self.content_hash(source)
+        if not self.contains(fingerprint):
+            data = loader.load(source, progress_callback=progress_callback)
+            self.save(fingerprint, data)
+        return fingerprint
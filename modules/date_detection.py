@@ -0,0 +1,98 @@
+# modules/date_detection.py
+
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+
+CANDIDATE_FORMATS = [
+    '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y/%m/%d',
+    '%d-%m-%Y', '%m-%d-%Y', '%m/%d/%Y', '%d/%m/%Y', '%d.%m.%Y',
+    '%m/%d/%Y %H:%M', '%d-%m-%Y %H:%M:%S', '%d %b %Y', '%b %d, %Y', '%d-%b-%Y', '%Y%m%d',
+]
+DATE_LIKE = re.compile(r'^\s*(\d{1,4}[-/. ]\w{1,9}[-/., ]+\d{1,4}|\w{3,9} \d{1,2}, \d{4}|\d{8})')
+
+
+def infer_date_formats(sample, min_match=0.9):
+    """Picks the explicit formats that together parse a sample of strings, or None if it does not look like dates."""
+    sample = pd.Series(sample, dtype=object).dropna().astype(str)
+    if sample.empty or sample.map(lambda value: bool(DATE_LIKE.match(value))).mean() < min_match:
+        return None
+    remaining = sample
+    formats = []
+    while not remaining.empty:
+        best_format, best_parsed = None, 0
+        for fmt in CANDIDATE_FORMATS:
+            parsed = pd.to_datetime(remaining, format=fmt, errors='coerce').notna().sum()
+            if parsed > best_parsed:
+                best_format, best_parsed = fmt, parsed
+        if best_format is None:
+            break
+        formats.append(best_format)
+        remaining = remaining[pd.to_datetime(remaining, format=best_format, errors='coerce').isna()]
+    if (len(sample) - len(remaining)) / len(sample) < min_match:
+        return None
+    return formats
+
+
+def parse_dates(values, formats):
+    """Parses values with each format in turn, filling only the rows earlier formats could not parse."""
+    values = pd.Series(values, dtype=object) if not isinstance(values, pd.Series) else values
+    parsed = pd.to_datetime(values, format=formats[0], errors='coerce', cache=True)
+    for fmt in formats[1:]:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors='coerce', cache=True)
+    return parsed
+
+
+class DateColumns:
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 8
+
+    def __init__(self, data, sample_size=1000):
+        self.formats = {}
+        self.columns = {}
+        positions = np.unique(np.linspace(0, max(len(data) - 1, 0), num=min(sample_size, len(data)), dtype=np.int64))
+        for col in data.columns:
+            series = data[col]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                self.columns[col] = series
+                continue
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                values = pd.Series(series.cat.categories)
+            elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                values = series
+            else:
+                continue
+            formats = infer_date_formats(values.iloc[positions] if values is series else values.head(sample_size))
+            if not formats:
+                continue
+            self.formats[col] = formats
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes, uniques = series.cat.codes.to_numpy(), values
+            else:
+                codes, uniques = pd.factorize(series)
+            parsed_uniques = parse_dates(pd.Series(uniques, dtype=object), formats).to_numpy()
+            parsed = np.where(codes >= 0, parsed_uniques[codes], np.datetime64('NaT'))
+            self.columns[col] = pd.Series(parsed, index=series.index, name=col)
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached parsed date columns for a dataset, detecting them on first use."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            detected = cls._cache.get(fingerprint)
+            if detected is not None:
+                cls._cache.move_to_end(fingerprint)
+                return detected
+        detected = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = detected
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return detected
@@ -0,0 +1,108 @@
+# modules/downsampling.py
+
+import os
+import numpy as np
+
+DEFAULT_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', 2000))
+
+
+def _numeric_axis(x):
+    """Converts an x axis to floats for area computations, falling back to positions for non-numeric values."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype(float)
+    return np.arange(len(x), dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: picks n_out points that preserve the visual shape of the series."""
+    x = _numeric_axis(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        prev_x, prev_y = x[previous], y[previous]
+        area = np.abs(
+            (prev_x - next_x[bucket]) * (y[start:end] - prev_y)
+            - (prev_x - x[start:end]) * (next_y[bucket] - prev_y)
+        )
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """Keeps the minimum and maximum of each bucket so every peak and trough survives."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    bucket_size = int(np.ceil(n / max(n_out // 2, 1)))
+    n_buckets = int(np.ceil(n / bucket_size))
+    low = np.full(n_buckets * bucket_size, np.inf)
+    high = np.full(n_buckets * bucket_size, -np.inf)
+    low[:n] = np.where(np.isnan(y), np.inf, y)
+    high[:n] = np.where(np.isnan(y), -np.inf, y)
+    starts = np.arange(n_buckets) * bucket_size
+    indices = np.concatenate((
+        starts + low.reshape(n_buckets, bucket_size).argmin(axis=1),
+        starts + high.reshape(n_buckets, bucket_size).argmax(axis=1),
+        [0, n - 1],
+    ))
+    return np.unique(indices[indices < n])
+
+
+def downsample_indices(x, y, max_points=None, mode='lttb', keep=None):
+    """Returns sorted positions to plot, always including the positions in keep (e.g. anomalies)."""
+    max_points = max_points or DEFAULT_MAX_POINTS
+    if len(y) <= max_points:
+        indices = np.arange(len(y))
+    elif mode == 'lttb':
+        indices = lttb_indices(x, y, max_points)
+    elif mode == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling mode: {mode}")
+    if keep is not None and len(keep):
+        indices = np.union1d(indices, np.asarray(keep, dtype=np.int64))
+    return indices
+
+
+def downsample_frame(frame, x, y, max_points=None, mode='lttb', keep=None):
+    """Downsamples a frame already ordered by x to at most max_points rows plus any kept rows."""
+    max_points = max_points or DEFAULT_MAX_POINTS
+    if len(frame) <= max_points:
+        return frame
+    return frame.iloc[downsample_indices(frame[x].to_numpy(), frame[y].to_numpy(), max_points, mode, keep)]
+
+
+def downsample_series(series, max_points=None, mode='lttb', keep=None):
+    """Downsamples a series plotted against its index."""
+    max_points = max_points or DEFAULT_MAX_POINTS
+    if len(series) <= max_points:
+        return series
+    return series.iloc[downsample_indices(series.index.to_numpy(), series.to_numpy(), max_points, mode, keep)]
+
+
+def evenly_spaced(frame, max_points=None):
+    """Takes evenly spaced rows, for data with no numeric value to rank points by."""
+    max_points = max_points or DEFAULT_MAX_POINTS
+    if len(frame) <= max_points:
+        return frame
+    return frame.iloc[np.unique(np.linspace(0, len(frame) - 1, max_points).astype(np.int64))]
@@ -0,0 +1,83 @@
+# modules/event_study.py
+
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from modules.date_detection import DateColumns
+
+
+class EventStudy:
+    """Compares each metric's mean in the window before every event with the window starting at it.
+
+    Events are the rows where event_column equals 1, taken in date order when the dataset has a date
+    column. Window sums come from cumulative sums, so all events and metrics are scored at once;
+    events too close to either end of the data for full windows are skipped. Overlapping windows
+    from dense events are counted for each event.
+    """
+
+    def __init__(self, data, event_column='Strategy_Implemented', window=7):
+        self.window = window
+        self.metrics = [col for col in data.select_dtypes(include='number').columns if col != event_column]
+        dates = DateColumns.for_dataset(data).columns
+        order = np.arange(len(data))
+        if dates:
+            order = np.argsort(next(iter(dates.values())).to_numpy(), kind='stable')
+        self.values = data[self.metrics].to_numpy(dtype=float, na_value=np.nan)[order]
+        flags = (data[event_column].to_numpy()[order] == 1)
+        positions = np.flatnonzero(flags)
+        self.events = positions[(positions >= window) & (positions + window <= len(data))]
+        self.skipped = len(positions) - len(self.events)
+
+    def _window_means(self):
+        present = ~np.isnan(self.values)
+        zero = np.zeros((1, self.values.shape[1]))
+        sums = np.vstack([zero, np.cumsum(np.where(present, self.values, 0.0), axis=0)])
+        counts = np.vstack([zero, np.cumsum(present, axis=0)])
+        t, w = self.events, self.window
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pre = (sums[t] - sums[t - w]) / (counts[t] - counts[t - w])
+            post = (sums[t + w] - sums[t]) / (counts[t + w] - counts[t])
+        return pre, post
+
+    def per_event(self):
+        """Pre and post window means, delta and lift for every event and metric (events x metrics each)."""
+        pre, post = self._window_means()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lift = np.where(pre != 0, (post - pre) / np.abs(pre), np.nan)
+        return {'pre': pre, 'post': post, 'delta': post - pre, 'lift': lift}
+
+    def summary(self, level=0.95):
+        """Average delta and lift per metric across events, with normal-approximation confidence intervals."""
+        results = self.per_event()
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        table = {}
+        for name in ('delta', 'lift'):
+            values = results[name]
+            n = (~np.isnan(values)).sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.nanmean(values, axis=0) if len(values) else np.full(len(self.metrics), np.nan)
+                margin = z * np.nanstd(values, axis=0, ddof=1) / np.sqrt(n) if len(values) > 1 else np.full(len(self.metrics), np.nan)
+            table[f'mean_{name}'] = mean
+            table[f'{name}_ci_low'] = mean - margin
+            table[f'{name}_ci_high'] = mean + margin
+        with np.errstate(invalid='ignore'):
+            table['share_improved'] = (results['delta'] > 0).mean(axis=0) if len(self.events) else np.nan
+            table['pre_mean'] = np.nanmean(results['pre'], axis=0) if len(self.events) else np.nan
+            table['post_mean'] = np.nanmean(results['post'], axis=0) if len(self.events) else np.nan
+        summary = pd.DataFrame(table, index=pd.Index(self.metrics, name='metric'))
+        summary.insert(0, 'events', len(self.events))
+        return summary
+
+    def profile(self, metrics=None):
+        """Average event-aligned path of each metric relative to its pre-event mean, offsets -window..window-1."""
+        metrics = metrics or self.metrics
+        columns = [self.metrics.index(metric) for metric in metrics]
+        offsets = np.arange(-self.window, self.window)
+        if not len(self.events):
+            return pd.DataFrame(index=pd.Index(offsets, name='offset'), columns=metrics, dtype=float)
+        pre, _ = self._window_means()
+        aligned = self.values[:, columns][self.events[:, None] + offsets[None, :]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            relative = aligned / pre[:, columns][:, None, :] - 1.0
+            path = np.nanmean(np.where(np.isfinite(relative), relative, np.nan), axis=0)
+        return pd.DataFrame(path, index=pd.Index(offsets, name='offset'), columns=metrics)
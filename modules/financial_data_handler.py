@@ -1,24 +1,64 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 import yfinance as yf
 import pandas as pd
-from nltk.sentiment import SentimentIntensityAnalyzer
-import nltk
-import requests  
-import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from modules.market_cache import MarketDataCache, NullMarketCache, RequestCoalescer
+from modules.sentiment import HeadlineSentiment
+from modules.price_history import PriceHistoryStore, price_indicators
 
+SEARCH_URL = "https://query1.finance.yahoo.com/v1/finance/search"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session(pool_size=None):
+    """Returns the process-wide HTTP session, whose pooled connections are reused across lookups and threads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = pool_size or int(os.getenv('FINANCIAL_MAX_WORKERS', 8))
+            retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.headers.update({'User-Agent': 'Mozilla/5.0'})
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
 
-nltk.download('vader_lexicon', quiet=True)
 
 class FinancialDataHandler:
-    def __init__(self, llm):
-        self.sia = SentimentIntensityAnalyzer()
-        self.llm = llm  
-    
+    def __init__(self, llm, max_workers=None, timeout=None, cache=None):
+        self.sentiment = HeadlineSentiment.shared()
+        self.llm = llm
+        if cache is None:
+            cache = MarketDataCache.shared() if os.getenv('MARKET_CACHE_ENABLED', '1') != '0' else NullMarketCache()
+        self.cache = cache
+        self.requests = RequestCoalescer()
+        self.prices = PriceHistoryStore.shared()
+        self.max_workers = max_workers or int(os.getenv('FINANCIAL_MAX_WORKERS', 8))
+        self.timeout = timeout or float(os.getenv('FINANCIAL_REQUEST_TIMEOUT', 10))
+        self.session = shared_session(self.max_workers)
+
+    def _load(self, kind, key, fetch):
+        """Fetches through the per-render coalescer and then the persistent cache."""
+        return self.requests.get(kind, key, lambda: self.cache.get_or_fetch(kind, key, fetch))
+
+    def ticker(self, symbol):
+        """Returns the yf.Ticker shared by every lookup of this symbol in the current render."""
+        return self.requests.shared(symbol.upper(), lambda: yf.Ticker(symbol))
+
     def get_symbol_from_name(self, company_name):
+        return self._load('symbol', company_name.strip().lower(), lambda: self._search_symbol(company_name))
+
+    def _search_symbol(self, company_name):
         try:
-            query = urllib.parse.quote(company_name)
-            url = f"https://query1.finance.yahoo.com/v1/finance/search?q={query}"
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers)
+            response = self.session.get(SEARCH_URL, params={'q': company_name}, timeout=self.timeout)
             if response.status_code == 200:
                 data = response.json()
                 if 'quotes' in data and len(data['quotes']) > 0:
@@ -32,72 +72,140 @@ class FinancialDataHandler:
             print(f"Error fetching symbol: {str(e)}")
             return None
 
+    @staticmethod
+    def financials_row(symbol, info):
+        """Maps a ticker's info to the overview columns shown for each company."""
+        return {
+            'Symbol': symbol.upper(),
+            'Company Name': info.get('shortName', 'N/A'),
+            'Sector': info.get('sector', 'N/A'),
+            'Industry': info.get('industry', 'N/A'),
+            'Market Cap': info.get('marketCap', 'N/A'),
+            'Enterprise Value': info.get('enterpriseValue', 'N/A'),
+            'Trailing P/E': info.get('trailingPE', 'N/A'),
+            'Forward P/E': info.get('forwardPE', 'N/A'),
+            'PEG Ratio': info.get('pegRatio', 'N/A'),
+            'Price to Sales': info.get('priceToSalesTrailing12Months', 'N/A'),
+            'Price to Book': info.get('priceToBook', 'N/A'),
+            'Profit Margin': info.get('profitMargins', 'N/A'),
+            'Operating Margin': info.get('operatingMargins', 'N/A'),
+            'Return on Assets': info.get('returnOnAssets', 'N/A'),
+            'Return on Equity': info.get('returnOnEquity', 'N/A'),
+            'Revenue': info.get('totalRevenue', 'N/A'),
+            'Gross Profit': info.get('grossProfits', 'N/A'),
+            'EBITDA': info.get('ebitda', 'N/A'),
+            'Net Income': info.get('netIncomeToCommon', 'N/A'),
+        }
+
+    @staticmethod
+    def financials_frame(rows):
+        """Builds the Symbol-indexed overview table from financials rows, or None when there are none."""
+        rows = [row for row in rows if row]
+        if not rows:
+            return None
+        return pd.DataFrame(rows).drop_duplicates('Symbol').set_index('Symbol')
+
+    def fetch_company(self, company_name):
+        """Resolves one company name and loads its overview row, or returns None when it cannot be found."""
+        symbol = self.get_symbol_from_name(company_name)
+        if not symbol:
+            print(f"Could not find symbol for company name: {company_name}")
+            return None
+        info = self.get_ticker_info(symbol)
+        if 'shortName' not in info:
+            print(f"No company found with name: {company_name}")
+            return None
+        return self.financials_row(symbol, info)
+
+    def get_ticker_info(self, symbol):
+        return self._load('info', symbol.upper(), lambda: self.ticker(symbol).info)
+
+    def get_ticker_news(self, symbol):
+        return self._load('news', symbol.upper(), lambda: self.ticker(symbol).news)
+
+    def iter_company_financials(self, company_names, deadline=None):
+        """Fetches companies concurrently, yielding (company_name, row or None) as each one finishes.
+
+        At most max_workers companies are in flight. Companies still loading when the deadline (three
+        request timeouts by default) passes are yielded as None rather than holding up the others.
+        """
+        if isinstance(company_names, str):
+            company_names = [company_names]
+        company_names = list(dict.fromkeys(name for name in company_names if name))
+        if not company_names:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(company_names)))
+        futures = {executor.submit(self.fetch_company, name): name for name in company_names}
+        pending = set(company_names)
+        try:
+            for future in as_completed(futures, timeout=deadline or self.timeout * 3):
+                name = futures[future]
+                pending.discard(name)
+                try:
+                    yield name, future.result()
+                except Exception as e:
+                    print(f"Error fetching financials for {name}: {str(e)}")
+                    yield name, None
+        except FuturesTimeout:
+            for name in company_names:
+                if name in pending:
+                    print(f"Timed out fetching financials for {name}")
+                    yield name, None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def get_company_financials(self, company_names):
         try:
             if isinstance(company_names, str):
                 company_names = [company_names]
-
-            financials_list = []
-            for company_name in company_names:
-                symbol = self.get_symbol_from_name(company_name)
-                if symbol:
-                    ticker = yf.Ticker(symbol)
-                    info = ticker.info
-                    if 'shortName' in info:  
-                        financials = {
-                            'Symbol': symbol.upper(),
-                            'Company Name': info.get('shortName', 'N/A'),
-                            'Sector': info.get('sector', 'N/A'),
-                            'Industry': info.get('industry', 'N/A'),
-                            'Market Cap': info.get('marketCap', 'N/A'),
-                            'Enterprise Value': info.get('enterpriseValue', 'N/A'),
-                            'Trailing P/E': info.get('trailingPE', 'N/A'),
-                            'Forward P/E': info.get('forwardPE', 'N/A'),
-                            'PEG Ratio': info.get('pegRatio', 'N/A'),
-                            'Price to Sales': info.get('priceToSalesTrailing12Months', 'N/A'),
-                            'Price to Book': info.get('priceToBook', 'N/A'),
-                            'Profit Margin': info.get('profitMargins', 'N/A'),
-                            'Operating Margin': info.get('operatingMargins', 'N/A'),
-                            'Return on Assets': info.get('returnOnAssets', 'N/A'),
-                            'Return on Equity': info.get('returnOnEquity', 'N/A'),
-                            'Revenue': info.get('totalRevenue', 'N/A'),
-                            'Gross Profit': info.get('grossProfits', 'N/A'),
-                            'EBITDA': info.get('ebitda', 'N/A'),
-                            'Net Income': info.get('netIncomeToCommon', 'N/A'),
-                        }
-                        financials_list.append(financials)
-                    else:
-                        print(f"No company found with name: {company_name}")
-                else:
-                    print(f"Could not find symbol for company name: {company_name}")
-
-            if financials_list:
-                financials_df = pd.DataFrame(financials_list)
-                financials_df.set_index('Symbol', inplace=True)
-                return financials_df
-            else:
-                return None  
+            rows = dict(self.iter_company_financials(company_names))
+            return self.financials_frame(rows.get(name) for name in company_names)
         except Exception as e:
             print(f"Error fetching financials: {str(e)}")
             return None
 
+    def _news_frame(self, symbol):
+        news_df = pd.DataFrame(self.get_ticker_news(symbol))
+        if news_df.empty:
+            return pd.DataFrame()
+        news_df = news_df[['title', 'publisher', 'link', 'providerPublishTime']]
+        news_df['providerPublishTime'] = pd.to_datetime(news_df['providerPublishTime'], unit='s')
+        return news_df
+
     def get_company_news(self, symbol):
         try:
-            ticker = yf.Ticker(symbol)
-            news = ticker.news
-            news_df = pd.DataFrame(news)
+            news_df = self._news_frame(symbol)
             if not news_df.empty:
-                news_df = news_df[['title', 'publisher', 'link', 'providerPublishTime']]
-                news_df['providerPublishTime'] = pd.to_datetime(news_df['providerPublishTime'], unit='s')
-                
-                news_df['Sentiment'] = news_df['title'].apply(lambda x: self.sia.polarity_scores(x)['compound'])
-                return news_df
-            else:
-                return pd.DataFrame()
+                news_df['Sentiment'] = self.sentiment.score(news_df['title'])
+            return news_df
         except Exception as e:
             print(f"Error fetching news: {str(e)}")
             return pd.DataFrame()
 
+    def get_news_sentiment(self, symbols):
+        """Loads every company's news, scores all headlines in one batch and aggregates them.
+
+        Returns (news, by_company, by_day): the scored headlines with a Symbol column, and sentiment
+        per company and per company and day.
+        """
+        symbols = list(symbols)
+
+        def load(symbol):
+            try:
+                return self._news_frame(symbol)
+            except Exception as e:
+                print(f"Error fetching news: {str(e)}")
+                return pd.DataFrame()
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(symbols)))) as executor:
+            frames = [frame.assign(Symbol=symbol) for symbol, frame in zip(symbols, executor.map(load, symbols)) if not frame.empty]
+        if not frames:
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        news = pd.concat(frames, ignore_index=True)
+        news['Sentiment'] = self.sentiment.score(news['title'])
+        by_company, by_day = self.sentiment.aggregate(news)
+        return news, by_company, by_day
+
     def get_industry_averages(self, industry, metric):
         
         industry_data = {
@@ -131,18 +239,25 @@ class FinancialDataHandler:
 
     def get_stock_data(self, symbol, period='1y'):
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
-            return hist
+            if period == self.prices.period:
+                return self.prices.history(symbol)
+            return self._load('history', f"{symbol.upper()}:{period}", lambda: self.ticker(symbol).history(period=period))
         except Exception as e:
             print(f"Error fetching stock data: {str(e)}")
             return None
 
+    def get_price_indicators(self, symbols):
+        """Refreshes all symbols' price history in one batch and returns their indicators, one row per symbol."""
+        try:
+            return price_indicators(self.prices.closes(symbols))
+        except Exception as e:
+            print(f"Error computing price indicators: {str(e)}")
+            return pd.DataFrame()
+
     def get_recent_changes(self, symbol):
         
         try:
-            ticker = yf.Ticker(symbol)
-            news = ticker.news
+            news = self.get_ticker_news(symbol)
             if news:
                 
                 news_texts = [item['title'] + ". " + item.get('summary', '') for item in news]
@@ -155,3 +270,9 @@ class FinancialDataHandler:
         except Exception as e:
             print(f"Error fetching recent changes: {str(e)}")
             return "Error fetching recent changes."
+
+    def iter_recent_changes(self, symbols):
+        """Yields (symbol, insights) pairs as each company's news analysis completes."""
+        symbols = list(symbols)
+        for index, insights in self.llm.map_concurrently(self.get_recent_changes, symbols):
+            yield symbols[index], insights
@@ -0,0 +1,155 @@
+# modules/forecasting.py
+
+import os
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+from modules.rollup_cube import RollupCube, FREQUENCIES
+
+PANDAS_FREQUENCIES = {'day': 'D', 'week': 'W-MON', 'month': 'MS', 'quarter': 'QS', 'year': 'YS'}
+SEASON_LENGTHS = {'day': 7, 'week': 52, 'month': 12, 'quarter': 4}
+
+
+def detect_frequency(dates, max_periods=None):
+    """Picks the finest bucket no finer than the typical gap between dates that keeps the history under max_periods."""
+    max_periods = max_periods or int(os.getenv('FORECAST_MAX_PERIODS', 120))
+    days = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+    days = days[~np.isnat(days)]
+    if len(days) < 2:
+        return None
+    gap = float(np.median(np.diff(days).astype(np.int64)))
+    span = float((days[-1] - days[0]).astype(np.int64)) + 1
+    lengths = {'day': 1, 'week': 7, 'month': 30.4, 'quarter': 91.3, 'year': 365.25}
+    for freq in FREQUENCIES:
+        if lengths[freq] >= gap * 0.9 and span / lengths[freq] <= max_periods:
+            return freq
+    return 'year'
+
+
+def design_matrix(t, season_length=None, harmonics=0):
+    """Intercept, linear trend and Fourier seasonal terms for time steps t."""
+    t = np.asarray(t, dtype=float)
+    columns = [np.ones_like(t), t]
+    for k in range(1, harmonics + 1):
+        angle = 2 * np.pi * k * t / season_length
+        columns.extend([np.sin(angle), np.cos(angle)])
+    return np.column_stack(columns)
+
+
+class ForecastEngine:
+    """Fits trend plus seasonal regressions to every metric at once and serves forecasts with prediction intervals.
+
+    Metrics are aggregated per detected period (from the rollup cube when the dataset has a date column,
+    otherwise each row is one period) and solved together with one least-squares call, since they share
+    the same design matrix.
+    """
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 4
+
+    def __init__(self, data, max_harmonics=3):
+        self.data = data
+        self.cube = RollupCube.for_dataset(data)
+        self.max_harmonics = max_harmonics
+        self._fits = {}
+        self._fits_lock = threading.Lock()
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached engine for a dataset, so fitted models survive reruns."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            engine = cls._cache.get(fingerprint)
+            if engine is not None:
+                cls._cache.move_to_end(fingerprint)
+                return engine
+        engine = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = engine
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return engine
+
+    def history(self, agg='sum', freq=None):
+        """Returns the per-period metric table the models are fitted on, and the frequency used."""
+        metrics = self.cube.measures
+        if self.cube.date_column is not None and metrics:
+            freq = freq or detect_frequency(self.cube.series(metrics[0], 'day', 'count').index.to_numpy())
+        if self.cube.date_column is None or freq is None or not metrics:
+            return self.data[metrics].reset_index(drop=True), None
+        table = pd.concat([self.cube.series(metric, freq, agg) for metric in metrics], axis=1)
+        full_range = pd.date_range(table.index.min(), table.index.max(), freq=PANDAS_FREQUENCIES[freq])
+        table = table.reindex(full_range)
+        if agg in ('sum', 'count'):
+            table = table.fillna(0.0)
+        table.index.name = self.cube.date_column
+        return table, freq
+
+    def fit(self, agg='sum', freq=None):
+        """Fits all metrics for one aggregation and frequency, reusing the cached fit when there is one."""
+        key = (agg, freq)
+        with self._fits_lock:
+            if key in self._fits:
+                return self._fits[key]
+        table, freq = self.history(agg, freq)
+        n = len(table)
+        season_length = SEASON_LENGTHS.get(freq)
+        harmonics = min(self.max_harmonics, season_length // 2) if season_length and n >= 2 * season_length else 0
+        X = design_matrix(np.arange(n), season_length, harmonics)
+
+        values = table.to_numpy(dtype=float)
+        observed = ~np.isnan(values)
+        if observed.all():
+            coefficients = np.linalg.lstsq(X, values, rcond=None)[0]
+            xtx_inv = np.linalg.pinv(X.T @ X)
+        else:
+            # Gaps only occur for mean/min/max buckets; fit those metrics on their observed periods,
+            # with one (X'X)^-1 per metric so their intervals reflect the rows they were fitted on.
+            coefficients = np.column_stack([
+                np.linalg.lstsq(X[observed[:, j]], values[observed[:, j], j], rcond=None)[0]
+                for j in range(values.shape[1])
+            ])
+            xtx_inv = np.stack([
+                np.linalg.pinv(X[observed[:, j]].T @ X[observed[:, j]])
+                for j in range(values.shape[1])
+            ])
+        residuals = np.where(observed, values - X @ coefficients, 0.0)
+        dof = np.maximum(observed.sum(axis=0) - X.shape[1], 1)
+        fit = {
+            'table': table,
+            'freq': freq,
+            'season_length': season_length,
+            'harmonics': harmonics,
+            'coefficients': coefficients,
+            'sigma': np.sqrt((residuals ** 2).sum(axis=0) / dof),
+            'xtx_inv': xtx_inv,
+        }
+        with self._fits_lock:
+            self._fits[key] = fit
+        return fit
+
+    def forecast(self, periods, agg='sum', freq=None, level=0.95):
+        """Returns (history, forecast) where forecast has forecast/lower/upper columns per metric."""
+        fit = self.fit(agg, freq)
+        table, n = fit['table'], len(fit['table'])
+        t = np.arange(n, n + periods)
+        X_future = design_matrix(t, fit['season_length'], fit['harmonics'])
+        predicted = X_future @ fit['coefficients']
+        xtx_inv = fit['xtx_inv']
+        if xtx_inv.ndim == 2:
+            leverage = np.einsum('ij,jk,ik->i', X_future, xtx_inv, X_future)[:, None]
+        else:
+            leverage = np.einsum('ij,mjk,ik->im', X_future, xtx_inv, X_future)
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        margin = z * np.sqrt(1.0 + leverage) * fit['sigma'][None, :]
+
+        if fit['freq'] is None:
+            index = pd.RangeIndex(n, n + periods)
+        else:
+            index = pd.date_range(table.index[-1], periods=periods + 1, freq=PANDAS_FREQUENCIES[fit['freq']])[1:]
+        columns = pd.MultiIndex.from_product([table.columns, ['forecast', 'lower', 'upper']])
+        stacked = np.stack([predicted, predicted - margin, predicted + margin], axis=2).reshape(periods, -1)
+        return table, pd.DataFrame(stacked, index=index, columns=columns)
@@ -0,0 +1,126 @@
+# modules/kpi_alerts.py
+
+import numpy as np
+import pandas as pd
+
+RULE_KINDS = ['above', 'below', 'rate_of_change', 'rolling_above', 'rolling_below', 'consecutive_above', 'consecutive_below']
+
+
+class AlertRule:
+    """One alert condition applied to every KPI it names (or to all KPIs when kpis is None).
+
+    threshold may be a single number or a dict of per-KPI numbers; rate_of_change thresholds are
+    fractions (0.2 means a 20% move either way), window applies to the rolling rules and periods to
+    the consecutive ones.
+    """
+
+    def __init__(self, kind, threshold, kpis=None, window=3, periods=3, name=None):
+        if kind not in RULE_KINDS:
+            raise ValueError(f"Unknown alert rule: {kind}")
+        self.kind = kind
+        self.threshold = threshold
+        self.kpis = kpis
+        self.window = window
+        self.periods = periods
+        self.name = name or kind
+
+    @property
+    def lookback(self):
+        """How many earlier periods the rule needs to evaluate the latest one."""
+        if self.kind.startswith('rolling'):
+            return self.window
+        if self.kind.startswith('consecutive'):
+            return self.periods
+        return 1
+
+    def thresholds(self, kpis):
+        if isinstance(self.threshold, dict):
+            return np.array([self.threshold.get(kpi, np.nan) for kpi in kpis], dtype=float)
+        return np.full(len(kpis), float(self.threshold))
+
+    def breaches(self, values, kpis):
+        """Boolean matrix of periods x KPIs where the rule is breached."""
+        limits = self.thresholds(kpis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.kind == 'above':
+                return values > limits
+            if self.kind == 'below':
+                return values < limits
+            if self.kind == 'rate_of_change':
+                change = np.full(values.shape, np.nan)
+                change[1:] = values[1:] / values[:-1] - 1.0
+                return np.abs(change) > limits
+            if self.kind.startswith('rolling'):
+                sums = np.vstack([np.zeros((1, values.shape[1])), np.nancumsum(values, axis=0)])
+                means = np.full(values.shape, np.nan)
+                if len(values) >= self.window:
+                    means[self.window - 1:] = (sums[self.window:] - sums[:-self.window]) / self.window
+                return means > limits if self.kind == 'rolling_above' else means < limits
+            beyond = values > limits if self.kind == 'consecutive_above' else values < limits
+            # Run length of the current streak: distance to the most recent period that was not beyond.
+            positions = np.arange(len(values))[:, None]
+            last_reset = np.maximum.accumulate(np.where(beyond, -1, positions), axis=0)
+            return (positions - last_reset) >= self.periods
+
+
+class KPIAlertEngine:
+    """Evaluates every rule across every KPI with array operations and reports when breaches start.
+
+    Only the last few periods the rules need to look back over are kept between calls, so appended
+    periods are evaluated without re-scanning history.
+    """
+
+    def __init__(self, rules, kpis):
+        self.rules = list(rules)
+        self.kpis = list(kpis)
+        self._keep = max([rule.lookback for rule in self.rules] + [1]) + 1
+        self._tail = pd.DataFrame(columns=self.kpis, dtype=float)
+        self.events = self._empty_events()
+
+    def _empty_events(self):
+        return pd.DataFrame({
+            'period': pd.Series(dtype=object), 'kpi': pd.Series(dtype=str), 'rule': pd.Series(dtype=str),
+            'value': pd.Series(dtype=float), 'threshold': pd.Series(dtype=float),
+        })
+
+    def update(self, frame):
+        """Evaluates newly arrived periods and returns the breach events that started in them."""
+        new = frame[self.kpis].astype(float)
+        combined = pd.concat([self._tail, new]) if len(self._tail) else new
+        values = combined.to_numpy(dtype=float, na_value=np.nan)
+        offset = len(combined) - len(new)
+        found = []
+        for rule in self.rules:
+            applies = np.array([rule.kpis is None or kpi in rule.kpis for kpi in self.kpis])
+            breached = rule.breaches(values, self.kpis) & applies
+            started = breached.copy()
+            started[1:] &= ~breached[:-1]
+            rows, cols = np.nonzero(started[offset:])
+            if not len(rows):
+                continue
+            found.append(pd.DataFrame({
+                'period': combined.index[rows + offset],
+                'kpi': np.asarray(self.kpis, dtype=object)[cols],
+                'rule': np.full(len(rows), rule.name, dtype=object),
+                'value': values[rows + offset, cols],
+                'threshold': rule.thresholds(self.kpis)[cols],
+            }))
+        self._tail = combined.iloc[-self._keep:]
+        events = pd.concat(found, ignore_index=True).sort_values(['period', 'kpi'], kind='stable') if found else self._empty_events()
+        self.events = pd.concat([self.events, events], ignore_index=True) if len(self.events) else events.reset_index(drop=True)
+        return events.set_index('period')
+
+    def active(self):
+        """Rules breached in the most recent period, one row per KPI and rule."""
+        if not len(self._tail):
+            return self._empty_events().set_index('period')
+        values = self._tail.to_numpy(dtype=float, na_value=np.nan)
+        rows = []
+        for rule in self.rules:
+            breached = rule.breaches(values, self.kpis)[-1]
+            limits = rule.thresholds(self.kpis)
+            for col, kpi in enumerate(self.kpis):
+                if breached[col] and (rule.kpis is None or kpi in rule.kpis):
+                    rows.append({'period': self._tail.index[-1], 'kpi': kpi, 'rule': rule.name,
+                                 'value': values[-1, col], 'threshold': limits[col]})
+        return (pd.DataFrame(rows) if rows else self._empty_events()).set_index('period')
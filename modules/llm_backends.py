@@ -0,0 +1,112 @@
+# modules/llm_backends.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+import openai
+
+STUB_VOCABULARY = [
+    "sales", "profit", "region", "category", "growth", "margin", "customers", "trend",
+    "increase", "decline", "seasonal", "segment", "discount", "revenue", "quarter", "strategy",
+]
+
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self):
+        openai.api_key = os.getenv('OPENAI_API_KEY')
+
+    def complete(self, model, messages, max_tokens, temperature):
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        return response['choices'][0]['message']['content']
+
+    def stream(self, model, messages, max_tokens, temperature):
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        for chunk in response:
+            token = chunk['choices'][0]['delta'].get('content')
+            if token:
+                yield token
+
+
+class StubBackend:
+    """Offline backend returning deterministic responses with simulated latency, for load testing and profiling."""
+    name = "stub"
+
+    def __init__(self, latency=None, tokens_per_second=None, response_tokens=None, responses=None):
+        self.latency = latency if latency is not None else float(os.getenv('LLM_STUB_LATENCY', 0.0))
+        self.tokens_per_second = tokens_per_second if tokens_per_second is not None else float(os.getenv('LLM_STUB_TOKENS_PER_SECOND', 0.0))
+        self.response_tokens = response_tokens if response_tokens is not None else int(os.getenv('LLM_STUB_RESPONSE_TOKENS', 200))
+        self.responses = responses or {}
+        self.calls = 0
+        self.prompt_characters = 0
+        self.tokens_generated = 0
+        self._lock = threading.Lock()
+
+    def _render(self, messages, max_tokens):
+        """Returns a canned response whose trigger appears in the last message, or a templated one seeded by the messages."""
+        last = messages[-1]['content'] if messages else ""
+        for trigger, response in self.responses.items():
+            if trigger in last:
+                return response.split(" ")
+        seed = hashlib.sha256(json.dumps(messages, sort_keys=True).encode('utf-8')).hexdigest()
+        count = min(self.response_tokens, max_tokens)
+        words = [f"[stub {seed[:8]}]"]
+        for i in range(count - 1):
+            words.append(STUB_VOCABULARY[int(seed[i % 64], 16)])
+        return words
+
+    def _record(self, messages, tokens):
+        with self._lock:
+            self.calls += 1
+            self.prompt_characters += sum(len(message['content']) for message in messages)
+            self.tokens_generated += tokens
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def complete(self, model, messages, max_tokens, temperature):
+        words = self._render(messages, max_tokens)
+        time.sleep(self.latency + self._token_delay() * len(words))
+        self._record(messages, len(words))
+        return " ".join(words)
+
+    def stream(self, model, messages, max_tokens, temperature):
+        words = self._render(messages, max_tokens)
+        time.sleep(self.latency)
+        delay = self._token_delay()
+        for i, word in enumerate(words):
+            if delay:
+                time.sleep(delay)
+            yield word if i == 0 else f" {word}"
+        self._record(messages, len(words))
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'prompt_characters': self.prompt_characters,
+            'tokens_generated': self.tokens_generated,
+        }
+
+
+def get_backend(name=None):
+    """Builds the backend named by the argument or the LLM_BACKEND environment variable."""
+    name = (name or os.getenv('LLM_BACKEND', 'openai')).lower()
+    if name == 'stub':
+        return StubBackend()
+    if name == 'openai':
+        return OpenAIBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
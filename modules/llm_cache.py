@@ -0,0 +1,131 @@
+# modules/llm_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=None, max_entries=None, max_bytes=None, ttl_seconds=None):
+        self.path = path or os.getenv('LLM_CACHE_PATH', '.llm_cache.sqlite3')
+        self.max_entries = max_entries or int(os.getenv('LLM_CACHE_MAX_ENTRIES', 2000))
+        self.max_bytes = max_bytes or int(os.getenv('LLM_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    @classmethod
+    def shared(cls, path=None):
+        """Returns one cache instance per path so counters survive Streamlit reruns."""
+        path = path or os.getenv('LLM_CACHE_PATH', '.llm_cache.sqlite3')
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path=path)
+            return cls._shared[path]
+
+    @staticmethod
+    def make_key(model, messages, **params):
+        """Builds a stable key from the model, full message list and sampling parameters."""
+        payload = json.dumps({'model': model, 'messages': messages, 'params': params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode('utf-8')), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drops expired entries, then least recently used ones until both size caps hold."""
+        cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += cursor.rowcount
+        count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        removed_bytes = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if count - len(stale_keys) <= self.max_entries and total_bytes - removed_bytes <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            removed_bytes += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+        self.evictions += len(stale_keys)
+
+    def stats(self):
+        with self._lock:
+            count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': count,
+            'bytes': total_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+class NullCache:
+    """Drop-in replacement for ResponseCache that never stores anything, used when LLM_CACHE_ENABLED=0."""
+    hits = 0
+    evictions = 0
+
+    def __init__(self):
+        self.misses = 0
+
+    make_key = staticmethod(ResponseCache.make_key)
+
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, response):
+        pass
+
+    def stats(self):
+        return {'hits': 0, 'misses': self.misses, 'hit_rate': 0.0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+
+    def clear(self):
+        pass
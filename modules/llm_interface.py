@@ -0,0 +1,201 @@
+import openai
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from modules.llm_cache import ResponseCache, NullCache
+from modules.llm_backends import get_backend
+
+load_dotenv()
+
+class StreamingResponse:
+    """Yields response tokens as they arrive and keeps the final text and confidence once exhausted."""
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self._parts = []
+        self.text = None
+        self.confidence = None
+
+    def __iter__(self):
+        try:
+            for token in self._tokens:
+                self._parts.append(token)
+                yield token
+            self.confidence = 0.90
+        except openai.error.OpenAIError as e:
+            message = f"Error: {str(e)}"
+            self._parts.append(message)
+            self.confidence = 0.0
+            yield message
+        self.text = "".join(self._parts)
+
+    def result(self):
+        """Drains any remaining tokens and returns the same shape as conversational_response."""
+        if self.text is None:
+            for _ in self:
+                pass
+        return {"text": self.text, "confidence": self.confidence}
+
+class LLMInterface:
+    def __init__(self, cache=None, max_concurrency=None, backend=None):
+        self.backend = backend or get_backend()
+        self.model_name = "gpt-4o-mini"  # Use gpt-3.5-turbo or gpt-4o-mini
+        if cache is None:
+            cache = ResponseCache.shared() if os.getenv('LLM_CACHE_ENABLED', '1') != '0' else NullCache()
+        self.cache = cache
+        self.max_concurrency = max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+
+    def _chat_completion(self, messages, max_tokens, temperature):
+        """Returns the completion text, serving identical requests from the response cache."""
+        key = self.cache.make_key(self.model_name, messages, backend=self.backend.name, max_tokens=max_tokens, temperature=temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        content = self.backend.complete(self.model_name, messages, max_tokens=max_tokens, temperature=temperature)
+        self.cache.set(key, content)
+        return content
+
+    def _stream_chat_completion(self, messages, max_tokens, temperature):
+        """Yields completion tokens as they arrive and caches the full text once the stream ends."""
+        key = self.cache.make_key(self.model_name, messages, backend=self.backend.name, max_tokens=max_tokens, temperature=temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for token in self.backend.stream(self.model_name, messages, max_tokens=max_tokens, temperature=temperature):
+            parts.append(token)
+            yield token
+        self.cache.set(key, "".join(parts))
+
+    def _conversation_messages(self, conversation):
+        messages = [{"role": "system", "content": "You are a helpful data analyst assistant who provides detailed and specific answers based on the provided dataset. Do not provide code in your responses. If the user asks for a plot or chart, describe the insights instead of providing code."}]
+        for msg in conversation:
+            role = msg["sender"] if msg["sender"] in ("assistant", "system") else "user"
+            messages.append({"role": role, "content": msg["text"]})
+        return messages
+
+    def stream_conversational_response(self, conversation):
+        """Streaming counterpart of conversational_response."""
+        messages = self._conversation_messages(conversation)
+        return StreamingResponse(self._stream_chat_completion(messages, max_tokens=7048, temperature=0.2))
+
+    def conversational_response(self, conversation):
+        """Generates a response based on the conversation."""
+        try:
+            messages = self._conversation_messages(conversation)
+            ai_response = self._chat_completion(messages, max_tokens=7048, temperature=0.2)
+            return {"text": ai_response, "confidence": 0.90}
+        except openai.error.OpenAIError as e:
+            return {"text": f"Error: {str(e)}", "confidence": 0.0}
+
+    def map_concurrently(self, func, items, max_concurrency=None):
+        """Runs func over items with at most max_concurrency calls in flight, yielding (index, result) as each finishes."""
+        items = list(items)
+        if not items:
+            return
+        workers = min(max_concurrency or self.max_concurrency, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(func, item): index for index, item in enumerate(items)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def map_responses(self, prompts, max_concurrency=None):
+        """Sends independent prompts concurrently, yielding (index, text) in completion order."""
+        def respond(prompt):
+            return self.conversational_response([{'sender': 'user', 'text': prompt}])['text']
+        return self.map_concurrently(respond, prompts, max_concurrency=max_concurrency)
+
+    def generate_strategic_recommendations(self, data_summary, stream=False):
+        """Generates strategic recommendations based on data summary."""
+        prompt = (
+            f"As a seasoned business strategist, analyze the following data and offer detailed, actionable strategies.\n\n"
+            f"Data Summary:\n{data_summary}\n\n"
+            "Provide a comprehensive analysis and strategic recommendations."
+        )
+
+        if stream:
+            return self.stream_conversational_response([{'sender': 'user', 'text': prompt}])
+        response = self.conversational_response([{'sender': 'user', 'text': prompt}])
+        return response['text']
+
+    def generate_risk_analysis(self, strategies):
+        """Generates a risk analysis for each strategy."""
+        prompt = (
+            f"For each of the following strategies, perform a risk analysis. Identify potential risks and suggest mitigation plans.\n\n"
+            f"Strategies:\n{strategies}\n\n"
+            "Provide the risk analysis in bullet points under each strategy."
+        )
+
+        response = self.conversational_response([{'sender': 'user', 'text': prompt}])
+        return response['text']
+
+    def estimate_resources(self, strategies):
+        """Estimates resources required for each strategy."""
+        prompt = (
+            f"Estimate the resources required to implement each of the following strategies. Include time, budget, and personnel estimates.\n\n"
+            f"Strategies:\n{strategies}\n\n"
+            "Provide the estimates in a clear and concise manner."
+        )
+
+        response = self.conversational_response([{'sender': 'user', 'text': prompt}])
+        return response['text']
+
+    def simulate_custom_strategy(self, strategy_input, data_summary):
+        """Simulates the potential outcomes of a custom strategy."""
+        prompt = (
+            f"Given the following data summary:\n{data_summary}\n\n"
+            f"Simulate the potential outcomes of implementing the following strategy:\n{strategy_input}\n\n"
+            "Provide a detailed analysis of the expected impact on key business metrics."
+        )
+
+        response = self.conversational_response([{'sender': 'user', 'text': prompt}])
+        return response['text']
+    
+    def process_question(self, question):
+        """Processes the user's question and returns an answer."""
+        
+        data_summary = self.data.describe(include='all').transpose().to_string()
+        
+        categorical_cols = self.data.select_dtypes(include=['object', 'category']).columns
+        value_counts = ""
+        for col in categorical_cols:
+            counts = self.data[col].value_counts().head(10).to_string()
+            value_counts += f"\nColumn '{col}' value counts:\n{counts}\n"
+        
+        max_length = 1500 
+        total_length = len(data_summary) + len(value_counts)
+        if total_length > max_length:
+            data_summary = data_summary[:max_length//2] + "\n... [Data truncated]"
+            value_counts = value_counts[:max_length//2] + "\n... [Data truncated]"
+        prompt = (
+            f"You are an expert data analyst. Use the dataset summary below to provide a detailed answer to the user's question.\n\n"
+            f"Dataset Summary:\n{data_summary}\n\n"
+            f"{value_counts}\n\n"
+            "Remember to reference specific columns and data points in your answer.\n\n"
+            f"Question: {question}"
+        )
+        response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])
+        return response['text']
+    
+    def json_response(self, prompt):
+        """Asks for a single JSON object at temperature 0 and returns the raw text, or None on API errors."""
+        try:
+            messages = [
+                {"role": "system", "content": "You translate business questions into JSON query plans. Respond with a single JSON object and nothing else."},
+                {"role": "user", "content": prompt}
+            ]
+            return self._chat_completion(messages, max_tokens=600, temperature=0.0)
+        except openai.error.OpenAIError as e:
+            print(f"Error generating JSON response: {str(e)}")
+            return None
+
+    def generate_response(self, prompt):
+        """Generates a response based on a prompt."""
+        try:
+            messages = [
+                {"role": "system", "content": "You are a highly knowledgeable assistant. Do not provide code in your responses."},
+                {"role": "user", "content": prompt}
+            ]
+            return self._chat_completion(messages, max_tokens=7098, temperature=0.2)
+        except openai.error.OpenAIError as e:
+            return f"Error generating response: {str(e)}"
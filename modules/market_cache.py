@@ -0,0 +1,199 @@
+# modules/market_cache.py
+
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+import pandas as pd
+
+# Default freshness per data type; override with MARKET_CACHE_TTL_<KIND> (seconds).
+DEFAULT_TTLS = {
+    'symbol': 30 * 24 * 3600,
+    'info': 6 * 3600,
+    'news': 15 * 60,
+    'history': 3600,
+}
+
+
+class MarketDataCache:
+    """Persistent cache for market data lookups with a separate freshness window per data type.
+
+    Fresh entries are served directly. Entries past their TTL but within max_stale_seconds are still
+    served, while a background thread refreshes them; older ones are fetched again before returning.
+    In offline mode (MARKET_CACHE_OFFLINE=1) whatever is stored is served and nothing is fetched.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=None, ttls=None, max_stale_seconds=None, offline=None):
+        self.path = path or os.getenv('MARKET_CACHE_PATH', '.market_cache.sqlite3')
+        self.ttls = {kind: float(os.getenv(f'MARKET_CACHE_TTL_{kind.upper()}', ttl)) for kind, ttl in DEFAULT_TTLS.items()}
+        self.ttls.update(ttls or {})
+        self.max_stale_seconds = max_stale_seconds or float(os.getenv('MARKET_CACHE_MAX_STALE_SECONDS', 7 * 24 * 3600))
+        self.offline = offline if offline is not None else os.getenv('MARKET_CACHE_OFFLINE', '0') == '1'
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS market_data ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, encoding TEXT NOT NULL, value TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, PRIMARY KEY (kind, key))"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def shared(cls, path=None):
+        """Returns one cache instance per path so refresh bookkeeping survives Streamlit reruns."""
+        path = path or os.getenv('MARKET_CACHE_PATH', '.market_cache.sqlite3')
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path=path)
+            return cls._shared[path]
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, pd.DataFrame):
+            return 'frame', value.to_json(orient='table', date_unit='ns')
+        return 'json', json.dumps(value, default=str)
+
+    @staticmethod
+    def _decode(encoding, text):
+        if encoding == 'frame':
+            return pd.read_json(io.StringIO(text), orient='table')
+        return json.loads(text)
+
+    def get(self, kind, key):
+        """Returns (value, age_seconds) for a stored entry, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT encoding, value, fetched_at FROM market_data WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._decode(row[0], row[1]), time.time() - row[2]
+
+    def set(self, kind, key, value):
+        encoding, text = self._encode(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO market_data (kind, key, encoding, value, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, key, encoding, text, time.time())
+            )
+            self._conn.commit()
+
+    def get_or_fetch(self, kind, key, fetch):
+        """Returns the cached value for (kind, key), calling fetch() when it is missing or too old.
+
+        None results are not stored, so failed lookups are retried on the next call.
+        """
+        cached = self.get(kind, key)
+        if cached is not None:
+            value, age = cached
+            ttl = self.ttls.get(kind, 0)
+            if self.offline or age <= ttl:
+                self.hits += 1
+                return value
+            if age <= ttl + self.max_stale_seconds:
+                self.stale_hits += 1
+                self._refresh_in_background(kind, key, fetch)
+                return value
+        self.misses += 1
+        if self.offline:
+            return None
+        value = fetch()
+        if value is not None:
+            self.set(kind, key, value)
+        return value
+
+    def _refresh_in_background(self, kind, key, fetch):
+        with self._lock:
+            if (kind, key) in self._refreshing:
+                return
+            self._refreshing.add((kind, key))
+
+        def refresh():
+            try:
+                value = fetch()
+                if value is not None:
+                    self.set(kind, key, value)
+            except Exception as e:
+                print(f"Error refreshing cached {kind} for {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard((kind, key))
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT kind, COUNT(*) FROM market_data GROUP BY kind").fetchall())
+        return {'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses, 'entries': counts}
+
+    def clear(self, kind=None):
+        with self._lock:
+            if kind is None:
+                self._conn.execute("DELETE FROM market_data")
+            else:
+                self._conn.execute("DELETE FROM market_data WHERE kind = ?", (kind,))
+            self._conn.commit()
+
+
+class NullMarketCache:
+    """Drop-in replacement for MarketDataCache that always fetches, used when MARKET_CACHE_ENABLED=0."""
+
+    def get_or_fetch(self, kind, key, fetch):
+        return fetch()
+
+    def stats(self):
+        return {'hits': 0, 'stale_hits': 0, 'misses': 0, 'entries': {}}
+
+    def clear(self, kind=None):
+        pass
+
+
+class RequestCoalescer:
+    """Per-render data-access layer that runs each (resource, key) request at most once.
+
+    The first caller runs the fetch; callers that arrive while it is in flight wait for the same
+    result, and later callers get the completed one. Failed requests are shared with the callers
+    already waiting and then forgotten, so the next call retries. Call reset() to start a new render.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._objects = {}
+
+    def get(self, resource, key, fetch):
+        with self._lock:
+            future = self._requests.get((resource, key))
+            owner = future is None
+            if owner:
+                future = self._requests[(resource, key)] = Future()
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(fetch())
+        except Exception as e:
+            with self._lock:
+                self._requests.pop((resource, key), None)
+            future.set_exception(e)
+        return future.result()
+
+    def shared(self, key, factory):
+        """Returns one object per key for the whole render, e.g. one client per ticker symbol."""
+        with self._lock:
+            if key not in self._objects:
+                self._objects[key] = factory()
+            return self._objects[key]
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._objects.clear()
@@ -2,10 +2,15 @@ import streamlit as st
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import IsolationForest
 import seaborn as sns
 from modules.llm_interface import LLMInterface
+from modules.downsampling import downsample_series
+from modules.forecasting import ForecastEngine
+from modules.anomaly_detection import MetricAnomalies
+from modules.correlation import DatasetCorrelation
+from modules.kpi_alerts import AlertRule, KPIAlertEngine
+from modules.event_study import EventStudy
+from modules.prompt_packer import PromptPacker
 
 class MetricTracker:
     def __init__(self, llm, dataset):
@@ -13,131 +18,211 @@ class MetricTracker:
         self.dataset = dataset
 
     def automated_insight_generation(self, metric, data):
-        """Generates insights using the LLM based on the plotted data."""
+        """Generates insights using the LLM based on the plotted data or an already formatted summary."""
+        data_text = data if isinstance(data, str) else data.to_string(index=False)
         prompt = (
             f"Analyze the following time series data for the metric '{metric}':\n\n"
-            f"{data.to_string(index=False)}\n\n"
+            f"{data_text}\n\n"
             "Provide a summary of key trends, patterns, and any anomalies detected."
         )
         response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])['text']
         return response
 
     def kpi_dashboard(self):
-        """Displays an interactive dashboard for selected KPIs with threshold alerts."""
+        """Displays an interactive dashboard for selected KPIs with rule-based alerts."""
         st.subheader("Interactive KPI Dashboard")
         numeric_cols = self.dataset.select_dtypes(include='number').columns.tolist()
-        selected_kpis = st.multiselect("Select KPIs to track", numeric_cols, default=numeric_cols[:3])
+        history, _ = self.fit_forecast(1)
 
-        thresholds = {}
-        for kpi in selected_kpis:
-            threshold = st.number_input(f"Set alert threshold for {kpi}", value=float(self.dataset[kpi].mean()))
-            thresholds[kpi] = threshold
+        # KPI choice and rule settings apply immediately so the form always shows one threshold per selected KPI;
+        # thresholds are batched in the form so the chart and alerts only rerun when the user applies them.
+        selected_kpis = st.multiselect("Select KPIs to track", numeric_cols, default=numeric_cols[:3])
+        change_limit = st.number_input("Alert on period-over-period change above (%)", value=50.0, min_value=0.0)
+        window = st.number_input("Rolling window (periods)", value=3, min_value=1, step=1)
+        streak = st.number_input("Consecutive periods above threshold", value=3, min_value=1, step=1)
+        with st.form(key='kpi_form'):
+            thresholds = {}
+            for kpi in selected_kpis:
+                thresholds[kpi] = st.number_input(f"Set alert threshold for {kpi}", value=float(history[kpi].mean()))
+            st.form_submit_button("Apply")
+
+        if not selected_kpis:
+            return
+        rules = [
+            AlertRule('above', thresholds, name='above threshold'),
+            AlertRule('rate_of_change', change_limit / 100, name='sharp change'),
+            AlertRule('rolling_above', thresholds, window=int(window), name=f'{int(window)}-period average above threshold'),
+            AlertRule('consecutive_above', thresholds, periods=int(streak), name=f'{int(streak)} periods in a row above threshold'),
+        ]
+        alert_engine = KPIAlertEngine(rules, selected_kpis)
+        events = alert_engine.update(history)
 
         fig, ax = plt.subplots()
         for kpi in selected_kpis:
-            ax.plot(self.dataset.index, self.dataset[kpi], label=kpi)
-            ax.axhline(y=thresholds[kpi], color='r', linestyle='--', label=f'{kpi} Threshold')
+            series = downsample_series(history[kpi].dropna())
+            line, = ax.plot(series.index, series.values, label=kpi)
+            ax.axhline(y=thresholds[kpi], color=line.get_color(), linestyle='--', label=f'{kpi} Threshold')
         ax.set_title('KPI Dashboard')
         ax.legend()
         st.pyplot(fig)
 
-        
-        alerts = [f"**Alert:** {kpi} has crossed the threshold of {thresholds[kpi]}!"
-                  for kpi in selected_kpis if self.dataset[kpi].iloc[-1] > thresholds[kpi]]
+        _, forecast = self.fit_forecast(1)
+        next_period = forecast[selected_kpis].iloc[0].unstack()
+        st.write("**Next-period forecast:**")
+        st.table(next_period)
 
-        if alerts:
-            st.warning('\n'.join(alerts))
+        active = alert_engine.active()
+        if len(active):
+            st.warning('\n'.join(f"**Alert:** {kpi} - {rule} ({value:,.2f} vs {threshold:,.2f})"
+                                  for kpi, rule, value, threshold in active.itertuples(index=False)))
+        if len(events):
+            st.write(f"**Alert history ({len(events)} breaches started):**")
+            st.dataframe(events)
 
     def correlation_analysis(self):
-        """Identifies and visualizes correlations between different metrics."""
+        """Identifies and visualizes the strongest correlations between metrics."""
         st.subheader("Correlation Analysis Between Metrics")
 
-        numeric_data = self.dataset.select_dtypes(include=['number'])
-        if numeric_data.shape[1] > 1:
-            corr = numeric_data.corr()
+        correlation = self.compute_correlations()
+        if correlation is not None:
+            corr = correlation.clustered_matrix()
             fig, ax = plt.subplots(figsize=(10, 8))
-            sns.heatmap(corr, annot=True, cmap='coolwarm', ax=ax)
+            sns.heatmap(corr, annot=len(corr) <= 12, fmt='.2f', cmap='coolwarm', vmin=-1, vmax=1, ax=ax)
             st.pyplot(fig)
 
+            positive, negative = correlation.top_pairs()
+            st.write("**Strongest positive correlations:**")
+            st.table(positive)
+            st.write("**Strongest negative correlations:**")
+            st.table(negative)
+
+            pairs_text = (
+                PromptPacker(budget=PromptPacker.default_budget // 2)
+                .add_table(positive.round(3), priority=1.5, title="Strongest significant positive correlations:", index=False)
+                .add_table(negative.round(3), title="Strongest significant negative correlations:", index=False)
+                .pack()
+            )
             prompt = (
-                f"Analyze the following correlation matrix:\n\n{corr.to_string()}\n\n"
-                "Identify the strongest positive and negative correlations between metrics and discuss their potential implications."
+                f"Across {len(correlation.columns)} metrics, these are the strongest statistically significant correlations:\n\n{pairs_text}\n\n"
+                "Discuss the potential implications of the strongest positive and negative correlations."
             )
             response = self.llm.conversational_response([{'sender': 'user', 'text': prompt}])['text']
             st.write(f"**Correlation Insights:**\n{response}")
         else:
             st.write("Not enough numeric columns for correlation analysis.")
 
+    def compute_correlations(self):
+        """Returns the cached streaming correlation state of the numeric metrics, or None if there are fewer than two."""
+        if len(self.dataset.select_dtypes(include=['number']).columns) > 1:
+            return DatasetCorrelation.for_dataset(self.dataset)
+        return None
+
     def impact_analysis(self):
-        """Analyzes the impact of implemented strategies on metrics over time."""
+        """Summarizes how every metric moved around implemented strategies, averaged across events."""
         st.subheader("Impact Analysis of Implemented Strategies")
         if 'Strategy_Implemented' in self.dataset.columns:
-            strategy_dates = self.dataset[self.dataset['Strategy_Implemented'] == 1].index
-            numeric_cols = self.dataset.select_dtypes(include='number').columns.tolist()
-            fig, ax = plt.subplots()
-            for col in numeric_cols:
-                ax.plot(self.dataset.index, self.dataset[col], label=col)
-            for date in strategy_dates:
-                ax.axvline(x=date, color='green', linestyle='--', label='Strategy Implemented')
-            ax.set_title('Impact of Strategies on Metrics')
-            ax.legend()
+            window = st.slider("Rows before and after each strategy to compare", 1, 60, 7, key='impact_window')
+            study = self.study_impact(window)
+            if not len(study.events):
+                st.info("No strategy events have enough data on both sides of the selected window.")
+                return
+            summary = study.summary()
+            st.write(f"**Average change across {len(study.events)} strategy events (95% intervals):**")
+            st.dataframe(summary.drop(columns='events').round(4))
+            if study.skipped:
+                st.caption(f"{study.skipped} events too close to the start or end of the data were skipped.")
+
+            strongest = summary['mean_lift'].abs().nlargest(min(5, len(summary))).index.tolist()
+            lift = summary.loc[strongest]
+            fig, (bars, paths) = plt.subplots(1, 2, figsize=(12, 4))
+            bars.barh(strongest, lift['mean_lift'] * 100,
+                      xerr=[(lift['mean_lift'] - lift['lift_ci_low']) * 100, (lift['lift_ci_high'] - lift['mean_lift']) * 100])
+            bars.axvline(0, color='grey', linewidth=0.8)
+            bars.set_title('Average lift after strategies (%)')
+            profile = study.profile(strongest) * 100
+            for metric in strongest:
+                paths.plot(profile.index, profile[metric], label=metric)
+            paths.axvline(0, color='green', linestyle='--', label='Strategy Implemented')
+            paths.set_title('Average path around strategies (% vs. before)')
+            paths.set_xlabel('Rows from strategy')
+            paths.legend()
             st.pyplot(fig)
         else:
             st.info("No strategy implementation data found in the dataset.")
 
+    def study_impact(self, window=7):
+        """Scores every metric around every strategy event at once, comparing the windows before and after it."""
+        return EventStudy(self.dataset, window=window)
+
     def forecast_metrics(self):
         """Uses historical data to forecast future performance of key metrics."""
         st.subheader("Predictive Analytics for Key Metrics")
         numeric_cols = self.dataset.select_dtypes(include='number').columns.tolist()
         selected_metric = st.selectbox("Select a metric to forecast", numeric_cols)
         periods_to_forecast = st.slider("Select number of periods to forecast", 1, 12, 6)
+        aggregation = st.selectbox("Aggregate each period by", ['sum', 'mean'], key='forecast_agg')
 
         if st.button("Forecast Metric"):
-            data = self.dataset[selected_metric].dropna().reset_index(drop=True)
-            X = np.array(range(len(data))).reshape(-1, 1)
-            y = data.values
-
-            model = LinearRegression()
-            model.fit(X, y)
-            X_future = np.array(range(len(data), len(data) + periods_to_forecast)).reshape(-1, 1)
-            y_future = model.predict(X_future)
+            history, forecast = self.fit_forecast(periods_to_forecast, aggregation)
+            predicted = forecast[selected_metric]
 
+            shown = downsample_series(history[selected_metric].dropna())
             fig, ax = plt.subplots()
-            ax.plot(data.index, y, label='Historical Data')
-            ax.plot(X_future, y_future, label='Forecast', linestyle='--')
+            ax.plot(shown.index, shown.values, label='Historical Data')
+            ax.plot(predicted.index, predicted['forecast'], label='Forecast', linestyle='--')
+            ax.fill_between(predicted.index, predicted['lower'], predicted['upper'], alpha=0.2, label='95% Interval')
             ax.set_title(f"Forecast of {selected_metric}")
             ax.legend()
             st.pyplot(fig)
 
-            forecast_data = pd.DataFrame({
-                'Period': list(data.index) + list(X_future.flatten()),
-                selected_metric: list(y) + list(y_future)
-            })
-            insight = self.automated_insight_generation(selected_metric, forecast_data[selected_metric])
+            forecast_data = pd.concat([
+                history[[selected_metric]].tail(24).rename(columns={selected_metric: 'actual'}),
+                predicted.round(2),
+            ]).reset_index(names='Period')
+            insight = self.automated_insight_generation(selected_metric, forecast_data)
             st.write(f"**Forecast Insights:**\n{insight}")
 
+    def fit_forecast(self, periods_to_forecast, agg='sum'):
+        """Forecasts every numeric metric at once from the cached fit, returning the per-period history and the forecast."""
+        return ForecastEngine.for_dataset(self.dataset).forecast(periods_to_forecast, agg=agg)
+
+    def find_anomalies(self, metric):
+        """Returns a metric's series and its flagged rows from the cached streaming detector scores."""
+        flagged = MetricAnomalies.for_dataset(self.dataset).anomalies(metric)
+        data = self.dataset[metric]
+        return data.dropna(), data.loc[flagged.index]
+
     def detect_anomalies(self):
-        """Detects anomalies in key metrics using Isolation Forest."""
+        """Detects anomalies in every metric in one streaming pass and shows the selected one."""
         st.subheader("Anomaly Detection in Metrics")
         numeric_cols = self.dataset.select_dtypes(include='number').columns.tolist()
         selected_metric = st.selectbox("Select a metric for anomaly detection", numeric_cols, key='anomaly_metric')
 
         if st.button("Detect Anomalies"):
-            data = self.dataset[selected_metric].dropna().reset_index(drop=True)
-            X = data.values.reshape(-1, 1)
-
-            model = IsolationForest(contamination=0.1, random_state=42)
-            preds = model.fit_predict(X)
-            anomalies = data[preds == -1]
-
+            detected = MetricAnomalies.for_dataset(self.dataset)
+            summary = detected.summary()
+            st.write("**Anomalies per metric and detector:**")
+            st.table(summary)
+
+            data, anomalies = self.find_anomalies(selected_metric)
+            keep = data.index.get_indexer(anomalies.index)
+            shown = downsample_series(data, mode='minmax', keep=keep[keep >= 0])
             fig, ax = plt.subplots()
-            ax.plot(data.index, data.values, label='Data')
+            ax.plot(shown.index, shown.values, label='Data')
             ax.scatter(anomalies.index, anomalies.values, color='red', label='Anomalies')
             ax.set_title(f"Anomaly Detection in {selected_metric}")
             ax.legend()
             st.pyplot(fig)
 
-            insight = self.automated_insight_generation(selected_metric, data)
+            strongest = detected.anomalies(selected_metric).sort_values('score', ascending=False)
+            strongest.insert(0, selected_metric, self.dataset.loc[strongest.index, selected_metric])
+            anomaly_text = (
+                PromptPacker(budget=PromptPacker.default_budget // 2)
+                .add_section(summary.to_string(), priority=2.0, title="Anomalies per metric and detector:")
+                .add_table(strongest.round(2), title=f"Most anomalous {selected_metric} values (row, value, score, detector):")
+                .pack()
+            )
+            insight = self.automated_insight_generation(selected_metric, anomaly_text)
             st.write(f"**Anomaly Detection Insights:**\n{insight}")
 
     def track_metrics(self):
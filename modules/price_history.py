@@ -0,0 +1,161 @@
+# modules/price_history.py
+
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import yfinance as yf
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+TRADING_DAYS = 252
+
+
+def _empty_bars():
+    columns = {'Date': pd.Series(dtype='datetime64[ns]'), 'Symbol': pd.Series(dtype=object)}
+    columns.update({column: pd.Series(dtype=float) for column in PRICE_COLUMNS})
+    return pd.DataFrame(columns)
+
+
+def _to_long(raw, symbols):
+    """Turns yf.download output (wide, one column level per ticker) into Date/Symbol/OHLCV rows."""
+    if raw is None or raw.empty:
+        return _empty_bars()
+    if not isinstance(raw.columns, pd.MultiIndex):
+        raw = pd.concat({symbols[0]: raw}, axis=1).swaplevel(0, 1, axis=1)
+    long = raw.stack(level=-1, future_stack=True).rename_axis(['Date', 'Symbol']).reset_index()
+    dates = pd.to_datetime(long['Date'])
+    long['Date'] = dates.dt.tz_localize(None) if dates.dt.tz is not None else dates
+    long['Symbol'] = long['Symbol'].astype(str).str.upper()
+    long = long.reindex(columns=['Date', 'Symbol'] + PRICE_COLUMNS)
+    return long.dropna(subset=['Close'])
+
+
+class PriceHistoryStore:
+    """Daily bars for many tickers in one Arrow IPC file, downloaded in batches and extended incrementally.
+
+    New symbols are downloaded together for `period`; symbols already stored are refreshed with one
+    batch download starting at the earliest of their last bars, and only bars on or after each
+    symbol's last stored bar are merged in. Symbols checked within refresh_seconds are not checked again.
+    Like the market data cache, offline mode (MARKET_CACHE_OFFLINE=1) serves the stored bars and never downloads.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root=None, period=None, refresh_seconds=None, offline=None):
+        self.root = root or os.getenv('PRICE_STORE_DIR', '.price_store')
+        self.period = period or os.getenv('PRICE_STORE_PERIOD', '1y')
+        self.refresh_seconds = refresh_seconds or float(os.getenv('PRICE_STORE_REFRESH_SECONDS', 3600))
+        self.offline = offline if offline is not None else os.getenv('MARKET_CACHE_OFFLINE', '0') == '1'
+        self.path = os.path.join(self.root, 'prices.arrow')
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    @classmethod
+    def shared(cls, root=None):
+        """Returns one store per directory so refresh bookkeeping survives Streamlit reruns."""
+        root = root or os.getenv('PRICE_STORE_DIR', '.price_store')
+        with cls._shared_lock:
+            if root not in cls._shared:
+                cls._shared[root] = cls(root=root)
+            return cls._shared[root]
+
+    def load(self):
+        """Memory-maps the stored bars as a long Date/Symbol/OHLCV table."""
+        if not os.path.exists(self.path):
+            return _empty_bars()
+        source = pa.memory_map(self.path, 'r')
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def _save(self, bars):
+        table = pa.Table.from_pandas(bars, preserve_index=False)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _download(symbols, **kwargs):
+        raw = yf.download(symbols, group_by='column', auto_adjust=True, progress=False, threads=True, **kwargs)
+        return _to_long(raw, symbols)
+
+    def refresh(self, symbols):
+        """Brings the stored bars of symbols up to date and returns the whole store."""
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        with self._lock:
+            now = time.time()
+            due = [symbol for symbol in symbols if now - self._checked.get(symbol, 0) > self.refresh_seconds]
+            bars = self.load()
+            if not due or self.offline:
+                return bars
+            last_bar = bars.groupby('Symbol')['Date'].max()
+            stored = [symbol for symbol in due if symbol in last_bar.index]
+            new = [symbol for symbol in due if symbol not in last_bar.index]
+            downloads = []
+            try:
+                if new:
+                    downloads.append(self._download(new, period=self.period))
+                if stored:
+                    recent = self._download(stored, start=last_bar[stored].min().strftime('%Y-%m-%d'))
+                    recent = recent[recent['Date'] >= recent['Symbol'].map(last_bar)]
+                    downloads.append(recent)
+            except Exception as e:
+                print(f"Error downloading price history: {str(e)}")
+                return bars
+            downloads = [frame for frame in downloads if not frame.empty]
+            if downloads:
+                # Re-downloaded last bars replace the stored ones, since the latest session may have been partial.
+                bars = pd.concat([frame for frame in [bars] + downloads if not frame.empty], ignore_index=True)
+                bars = bars.drop_duplicates(['Symbol', 'Date'], keep='last').sort_values(['Symbol', 'Date'], ignore_index=True)
+                self._save(bars)
+            self._checked.update(dict.fromkeys(due, now))
+            return bars
+
+    def closes(self, symbols, refresh=True):
+        """Closing prices as a Date x Symbol table for the given symbols."""
+        symbols = [symbol.upper() for symbol in symbols]
+        bars = self.refresh(symbols) if refresh else self.load()
+        bars = bars[bars['Symbol'].isin(symbols)]
+        return bars.pivot(index='Date', columns='Symbol', values='Close').reindex(columns=symbols).sort_index()
+
+    def history(self, symbol, refresh=True):
+        """One symbol's OHLCV bars indexed by date."""
+        bars = self.refresh([symbol]) if refresh else self.load()
+        return bars[bars['Symbol'] == symbol.upper()].set_index('Date')[PRICE_COLUMNS]
+
+
+def price_indicators(closes, short_window=20, long_window=50):
+    """Return, risk and trend indicators for every column of a Date x Symbol close table at once.
+
+    Relative strength is each ticker's return over the table's span minus the average return of the
+    other tickers in it.
+    """
+    closes = closes.astype(float)
+    if closes.empty:
+        return pd.DataFrame(index=pd.Index(closes.columns, name='Symbol'))
+    filled = closes.ffill()
+    first, last = closes.bfill().iloc[0], filled.iloc[-1]
+    daily = np.log(closes / closes.shift(1))
+    drawdown = filled / filled.cummax() - 1.0
+
+    total_return = last / first - 1.0
+    peers = total_return.notna().sum()
+    peer_mean = (total_return.sum() - total_return) / (peers - 1) if peers > 1 else total_return * np.nan
+    indicators = pd.DataFrame({
+        'Last Close': last,
+        'Return 1M': last / filled.shift(21).iloc[-1] - 1.0,
+        'Return 3M': last / filled.shift(63).iloc[-1] - 1.0,
+        'Return (period)': total_return,
+        'Volatility (ann.)': daily.std() * np.sqrt(TRADING_DAYS),
+        'Max Drawdown': drawdown.min(),
+        'Current Drawdown': drawdown.iloc[-1],
+        f'SMA {short_window}': filled.rolling(short_window, min_periods=1).mean().iloc[-1],
+        f'SMA {long_window}': filled.rolling(long_window, min_periods=1).mean().iloc[-1],
+        'Relative Strength vs Peers': total_return - peer_mean,
+    })
+    indicators[f'Above SMA {long_window}'] = indicators['Last Close'] > indicators[f'SMA {long_window}']
+    indicators.index.name = 'Symbol'
+    return indicators
@@ -0,0 +1,88 @@
+# modules/prompt_packer.py
+
+import os
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encodings = {}
+
+
+def _get_encoding(model):
+    if model not in _encodings:
+        encoding = None
+        if tiktoken is not None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                try:
+                    encoding = tiktoken.get_encoding('o200k_base')
+                except Exception as e:
+                    print(f"Error loading fallback tokenizer for {model}: {str(e)}")
+            except Exception as e:
+                print(f"Error loading tokenizer for {model}: {str(e)}")
+        _encodings[model] = encoding
+    return _encodings[model]
+
+
+def count_tokens(text, model='gpt-4o-mini'):
+    """Counts model tokens in text, estimating four characters per token if no tokenizer is available."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return max(1, (len(text) + 3) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class PromptPacker:
+    default_budget = int(os.getenv('PROMPT_TOKEN_BUDGET', 800))
+    omission_tokens = 12
+
+    def __init__(self, budget=None, model='gpt-4o-mini'):
+        self.budget = budget or self.default_budget
+        self.model = model
+        self.sections = []
+
+    def add_section(self, text, priority=1.0, header_lines=0, title=None):
+        """Adds a block whose first header_lines lines are kept together and whose remaining lines can be dropped from the end."""
+        lines = text.splitlines()
+        head = ([title] if title else []) + lines[:header_lines]
+        self.sections.append({'head': head, 'body': lines[header_lines:], 'priority': priority})
+        return self
+
+    def add_table(self, table, priority=1.0, title=None, **to_string_kwargs):
+        """Adds a DataFrame so that rows are only ever dropped whole, never cut mid-row."""
+        table = table.head(self.budget)
+        text = table.to_string(**to_string_kwargs)
+        header_lines = len(text.splitlines()) - len(table)
+        return self.add_section(text, priority=priority, header_lines=header_lines, title=title)
+
+    def pack(self):
+        """Fills the token budget section by section in priority order and returns the sections in their original order."""
+        remaining = self.budget
+        packed = {}
+        order = sorted(range(len(self.sections)), key=lambda i: -self.sections[i]['priority'])
+        for index in order:
+            section = self.sections[index]
+            head_cost = sum(count_tokens(line, self.model) + 1 for line in section['head'])
+            reserve = self.omission_tokens if section['body'] else 0
+            if head_cost + reserve > remaining:
+                continue
+            available = remaining - head_cost - reserve
+            kept = []
+            for line in section['body']:
+                cost = count_tokens(line, self.model) + 1
+                if cost > available:
+                    break
+                kept.append(line)
+                available -= cost
+            if section['body'] and not kept:
+                continue
+            omitted = len(section['body']) - len(kept)
+            lines = section['head'] + kept
+            if omitted:
+                lines.append(f"... [{omitted} more rows omitted]")
+            packed[index] = "\n".join(lines)
+            remaining = available + (0 if omitted else reserve)
+        return "\n\n".join(packed[index] for index in sorted(packed))
@@ -0,0 +1,299 @@
+# modules/query_engine.py
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+from modules.dataset_profile import DatasetProfile
+from modules.date_detection import DateColumns
+from modules.prompt_packer import PromptPacker
+from modules.rollup_cube import FREQUENCIES, period_starts
+
+FILTER_OPS = ['==', '!=', '>', '>=', '<', '<=', 'in', 'not in', 'between', 'contains']
+AGG_FUNCS = ['sum', 'mean', 'median', 'min', 'max', 'count', 'nunique']
+PLAN_KEYS = {'filters', 'groupby', 'time_bucket', 'aggregations', 'columns', 'sort', 'limit', 'answerable'}
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+PLAN_INSTRUCTIONS = """Return a JSON query plan that answers the question from the dataset described below, with these optional keys:
+  "filters": [{"column": <column>, "op": one of %(ops)s, "value": <value, or [low, high] for between, or a list for in>}]
+  "time_bucket": {"column": <date column>, "freq": one of %(freqs)s}
+  "groupby": [<column>, ...]
+  "aggregations": [{"column": <numeric column, or "*" to count rows>, "func": one of %(funcs)s, "as": <result name>}]
+  "columns": [<column>, ...] to list matching rows instead of aggregating
+  "sort": [{"column": <group column or aggregation name>, "descending": true|false}]
+  "limit": <number of result rows, at most %(max_limit)d>
+Filter dates with ISO strings (YYYY-MM-DD). If the question cannot be answered by such a query, return {"answerable": false}.
+Respond with the JSON object only."""
+
+
+class QueryPlanError(ValueError):
+    """Raised when a query plan uses anything outside the whitelist or refers to unknown columns."""
+
+
+def extract_json(text):
+    """Returns the first JSON object in a model response, tolerating code fences and surrounding prose."""
+    if not text:
+        return None
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        parsed = json.loads(match.group(0))
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+class QueryEngine:
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 4
+    max_results = 64
+
+    def __init__(self, data):
+        self.data = data
+        self.profile = DatasetProfile.for_dataset(data)
+        self.dates = DateColumns.for_dataset(data).columns
+        self.enabled = os.getenv('LOCAL_QUERY_ENABLED', '1') != '0'
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached engine for a dataset, so query results are reused across reruns."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            engine = cls._cache.get(fingerprint)
+            if engine is not None:
+                cls._cache.move_to_end(fingerprint)
+                return engine
+        engine = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = engine
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return engine
+
+    def schema_text(self, budget=None):
+        """Describes columns, types, date ranges and common values for the planning prompt."""
+        lines = []
+        for col in self.data.columns:
+            if col in self.dates:
+                dates = self.dates[col]
+                lines.append(f"- {col} (date, {dates.min():%Y-%m-%d} to {dates.max():%Y-%m-%d})")
+            elif self.profile.kinds[col] == 'numeric':
+                lines.append(f"- {col} (numeric)")
+            else:
+                values = ", ".join(str(value) for value in self.profile.value_counts[col].index)
+                lines.append(f"- {col} (categorical, {int(self.profile.stats[col]['unique'])} values, e.g. {values})")
+        return PromptPacker(budget=budget).add_section("\n".join(lines), title="Columns:").pack()
+
+    def plan(self, question, llm, history=None):
+        """Asks the model for a query plan; returns the validated plan, or None if it declines or the plan is invalid."""
+        if not self.enabled:
+            return None
+        earlier = "\n".join(f"{msg['sender']}: {msg['text']}" for msg in (history or [])[-4:])
+        prompt = (
+            PLAN_INSTRUCTIONS % {'ops': FILTER_OPS, 'freqs': FREQUENCIES, 'funcs': AGG_FUNCS, 'max_limit': MAX_LIMIT}
+            + f"\n\n{self.schema_text()}\n\n"
+            + (f"Earlier conversation:\n{earlier}\n\n" if earlier else "")
+            + f"Question: {question}"
+        )
+        plan = extract_json(llm.json_response(prompt))
+        if not isinstance(plan, dict) or plan.get('answerable') is False:
+            return None
+        try:
+            return self.validate(plan)
+        except QueryPlanError as e:
+            print(f"Discarding query plan: {str(e)}")
+            return None
+
+    def _check_column(self, column, what):
+        if not isinstance(column, (str, int, float)) or column not in self.data.columns:
+            raise QueryPlanError(f"Unknown {what} column: {column!r}")
+        return column
+
+    @staticmethod
+    def _entries(plan, key, kind):
+        """Returns plan[key] as a list, checking that it is a list whose elements are all of type kind."""
+        entries = plan.get(key) or []
+        if not isinstance(entries, list) or not all(isinstance(entry, kind) for entry in entries):
+            raise QueryPlanError(f"{key} must be a list of {'objects' if kind is dict else 'column names'}")
+        return entries
+
+    def validate(self, plan):
+        """Checks a plan against the whitelist and returns a normalized copy."""
+        if not isinstance(plan, dict):
+            raise QueryPlanError("Plan must be a JSON object")
+        unknown = set(plan) - PLAN_KEYS
+        if unknown:
+            raise QueryPlanError(f"Unsupported plan keys: {sorted(unknown)}")
+        normalized = {'filters': [], 'groupby': [], 'time_bucket': None, 'aggregations': [], 'columns': [], 'sort': []}
+
+        for condition in self._entries(plan, 'filters', dict):
+            op = condition.get('op')
+            if not isinstance(op, str) or op not in FILTER_OPS:
+                raise QueryPlanError(f"Unsupported filter operator: {op!r}")
+            value = condition.get('value')
+            if op in ('in', 'not in') and not isinstance(value, list):
+                value = [value]
+            if op == 'between' and not (isinstance(value, list) and len(value) == 2):
+                raise QueryPlanError("between expects [low, high]")
+            values = value if isinstance(value, list) else [value]
+            if not all(item is None or isinstance(item, (str, int, float, bool)) for item in values):
+                raise QueryPlanError(f"Filter values must be numbers, strings or lists of them: {value!r}")
+            normalized['filters'].append({'column': self._check_column(condition.get('column'), 'filter'), 'op': op, 'value': value})
+
+        bucket = plan.get('time_bucket')
+        if bucket:
+            if not isinstance(bucket, dict):
+                raise QueryPlanError("time_bucket must be an object with column and freq")
+            column = self._check_column(bucket.get('column'), 'time bucket')
+            if column not in self.dates:
+                raise QueryPlanError(f"{column!r} is not a date column")
+            if not isinstance(bucket.get('freq'), str) or bucket['freq'] not in FREQUENCIES:
+                raise QueryPlanError(f"Unsupported time bucket: {bucket.get('freq')!r}")
+            normalized['time_bucket'] = {'column': column, 'freq': bucket['freq']}
+
+        normalized['groupby'] = [self._check_column(col, 'group') for col in self._entries(plan, 'groupby', (str, int, float))]
+        numeric = set(self.profile.numeric_columns())
+        for aggregation in self._entries(plan, 'aggregations', dict):
+            func, column = aggregation.get('func'), aggregation.get('column', '*')
+            if not isinstance(func, str) or func not in AGG_FUNCS:
+                raise QueryPlanError(f"Unsupported aggregation: {func!r}")
+            if column == '*':
+                func = 'count'
+            else:
+                self._check_column(column, 'aggregation')
+                if func not in ('count', 'nunique') and column not in numeric:
+                    raise QueryPlanError(f"Cannot {func} non-numeric column {column!r}")
+            name = str(aggregation.get('as') or (f"{func}_{column}" if column != '*' else 'rows'))
+            normalized['aggregations'].append({'column': column, 'func': func, 'as': name})
+        normalized['columns'] = [self._check_column(col, 'output') for col in self._entries(plan, 'columns', (str, int, float))]
+
+        outputs = set(normalized['groupby']) | {agg['as'] for agg in normalized['aggregations']} | set(normalized['columns'])
+        if normalized['time_bucket']:
+            outputs.add(self._bucket_name(normalized['time_bucket']))
+        elif not outputs:
+            outputs = set(self.data.columns)
+        for order in self._entries(plan, 'sort', dict):
+            if not isinstance(order.get('column'), (str, int, float)) or order.get('column') not in outputs:
+                raise QueryPlanError(f"Cannot sort by {order.get('column')!r}")
+            normalized['sort'].append({'column': order['column'], 'descending': bool(order.get('descending', False))})
+
+        try:
+            normalized['limit'] = min(max(int(plan.get('limit') or DEFAULT_LIMIT), 1), MAX_LIMIT)
+        except (TypeError, ValueError):
+            raise QueryPlanError(f"Invalid limit: {plan.get('limit')!r}")
+        return normalized
+
+    @staticmethod
+    def _bucket_name(bucket):
+        return f"{bucket['column']} ({bucket['freq']})"
+
+    def _coerce(self, column, value):
+        """Converts plan literals to the column's type so comparisons stay vectorized."""
+        if isinstance(value, list):
+            return [self._coerce(column, item) for item in value]
+        try:
+            if column in self.dates:
+                return pd.Timestamp(value)
+            if self.profile.kinds[column] == 'numeric':
+                return float(value)
+        except (TypeError, ValueError):
+            raise QueryPlanError(f"Invalid value {value!r} for column {column!r}")
+        return value
+
+    def _mask(self, filters):
+        mask = np.ones(len(self.data), dtype=bool)
+        for condition in filters:
+            column, op = condition['column'], condition['op']
+            series = self.dates.get(column, self.data[column])
+            value = self._coerce(column, condition['value'])
+            if op == 'contains':
+                matched = series.astype(str).str.contains(str(value), case=False, regex=False)
+            elif op == 'in':
+                matched = series.isin(value)
+            elif op == 'not in':
+                matched = ~series.isin(value)
+            elif op == 'between':
+                matched = (series >= value[0]) & (series <= value[1])
+            else:
+                matched = {'==': series.__eq__, '!=': series.__ne__, '>': series.__gt__,
+                           '>=': series.__ge__, '<': series.__lt__, '<=': series.__le__}[op](value)
+            mask &= matched.fillna(False).to_numpy(dtype=bool)
+        return mask
+
+    def run(self, plan):
+        """Executes a validated plan over the full dataset, serving repeated plans from the per-dataset cache."""
+        key = json.dumps(plan, sort_keys=True, default=str)
+        with self._results_lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        mask = self._mask(plan['filters'])
+        keys = list(plan['groupby'])
+        needed = list(dict.fromkeys(keys + [agg['column'] for agg in plan['aggregations'] if agg['column'] != '*'] + plan['columns']))
+        frame = self.data.loc[mask, needed]
+        if plan['time_bucket']:
+            bucket = plan['time_bucket']
+            name = self._bucket_name(bucket)
+            days = self.dates[bucket['column']].to_numpy()[mask]
+            frame = frame.assign(**{name: period_starts(days, bucket['freq']).astype('datetime64[ns]')})
+            keys = [name] + keys
+
+        if plan['aggregations']:
+            if keys:
+                grouped = frame.groupby(keys, observed=True, sort=False)
+                result = pd.DataFrame({
+                    agg['as']: grouped.size() if agg['column'] == '*' else grouped[agg['column']].agg(agg['func'])
+                    for agg in plan['aggregations']
+                }).reset_index()
+            else:
+                result = pd.DataFrame([{
+                    agg['as']: len(frame) if agg['column'] == '*' else frame[agg['column']].agg(agg['func'])
+                    for agg in plan['aggregations']
+                }])
+        elif keys:
+            result = frame.groupby(keys, observed=True, sort=False).size().rename('rows').reset_index()
+        else:
+            result = self.data.loc[mask, plan['columns'] or list(self.data.columns)]
+
+        if plan['sort']:
+            result = result.sort_values(
+                [order['column'] for order in plan['sort']],
+                ascending=[not order['descending'] for order in plan['sort']], kind='stable'
+            )
+        elif plan['time_bucket'] and keys:
+            # Groups come back in first-seen row order; keep periods chronological so limit keeps the earliest ones.
+            result = result.sort_values(keys, kind='stable')
+        result = result.head(plan['limit']).reset_index(drop=True)
+        result.attrs['matched_rows'] = int(mask.sum())
+
+        with self._results_lock:
+            self._results[key] = result
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return result
+
+    def answer_context(self, question, llm, history=None, budget=None):
+        """Plans and runs a query for the question, returning a packed result description or None to fall back."""
+        plan = self.plan(question, llm, history)
+        if plan is None:
+            return None
+        try:
+            result = self.run(plan)
+        except (QueryPlanError, KeyError, TypeError, ValueError) as e:
+            print(f"Error running query plan: {str(e)}")
+            return None
+        packer = PromptPacker(budget=budget)
+        packer.add_section(json.dumps(plan, default=str), priority=2.0, title="Query plan:")
+        packer.add_section(f"Rows matching the filters: {result.attrs['matched_rows']} of {len(self.data)}", priority=2.0)
+        packer.add_table(result.round(2), priority=1.5, title="Query result:", index=False)
+        return packer.pack()
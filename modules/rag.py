@@ -1,6 +1,8 @@
 # modules/rag.py
 from modules.vector_db import VectorDB
 from modules.llm_interface import LLMInterface
+from modules.dataset_profile import DatasetProfile
+from modules.query_engine import QueryEngine
 
 class RAG:
     def __init__(self, llm):
@@ -8,16 +10,20 @@ class RAG:
         self.llm = llm
 
     def answer_dataset_question(self, question, dataset):
-        """Answer questions related to the dataset."""
+        """Answer questions related to the dataset, computing the answer locally when the question maps to a query."""
+        query_context = QueryEngine.for_dataset(dataset).answer_context(question, self.llm)
+        if query_context is not None:
+            context = (
+                "You are an expert data analyst. The query below was run over the full dataset to answer the user's question.\n\n"
+                f"{query_context}\n\n"
+                "Answer the question from this result, citing the numbers it contains.\n\n"
+                f"Question: {question}"
+            )
+            return self.llm.conversational_response([{'sender': 'user', 'text': context}])
         context = (
             "You are an expert data analyst. Use the dataset summary below to provide a detailed answer to the user's question.\n\n"
-            f"Dataset Summary:\n{dataset.describe(include='all').to_string()}\n\n"
-            "Value Counts for Categorical Columns (Top 10):\n"
+            f"Dataset Summary:\n{DatasetProfile.for_dataset(dataset).pack_summary()}\n"
         )
-        categorical_cols = dataset.select_dtypes(include=['object', 'category']).columns
-        for col in categorical_cols:
-            counts = dataset[col].value_counts().head(10).to_string()
-            context += f"\nColumn '{col}':\n{counts}\n"
         context += f"\nDataset Columns: {', '.join(dataset.columns)}\n"
         context += "Remember to reference specific columns and data points in your answer.\n\n"
         context += f"Question: {question}"
@@ -0,0 +1,191 @@
+# modules/rollup_cube.py
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+from modules.dataset_profile import DatasetProfile
+from modules.date_detection import DateColumns
+
+FREQUENCIES = ['day', 'week', 'month', 'quarter', 'year']
+AGGREGATIONS = ['sum', 'count', 'mean', 'min', 'max']
+
+
+def period_starts(days, freq):
+    """Maps datetime64[D] values to the first day of their day, week (Monday), month, quarter or year."""
+    days = np.asarray(days, dtype='datetime64[D]')
+    missing = np.isnat(days)
+    if freq == 'day':
+        starts = days
+    elif freq == 'week':
+        ordinals = days.astype(np.int64)
+        starts = (ordinals - (ordinals + 3) % 7).astype('datetime64[D]')
+    elif freq == 'month':
+        starts = days.astype('datetime64[M]').astype('datetime64[D]')
+    elif freq == 'quarter':
+        months = days.astype('datetime64[M]').astype(np.int64)
+        starts = (months - months % 3).astype('datetime64[M]').astype('datetime64[D]')
+    elif freq == 'year':
+        starts = days.astype('datetime64[Y]').astype('datetime64[D]')
+    else:
+        raise ValueError(f"Unknown frequency: {freq}")
+    return np.where(missing, np.datetime64('NaT', 'D'), starts)
+
+
+def _reduce_cells(dimension_codes, period_codes, period_values, sums, counts, mins, maxs):
+    """Aggregates rows into (dimension code, period) cells with bincount and ufunc.at, keeping occupied cells only.
+
+    The per-measure arrays are laid out measure-major, shape (n_measures, n_rows).
+    """
+    n_periods = max(len(period_values), 1)
+    cells = dimension_codes.astype(np.int64) * n_periods + period_codes.reshape(-1)
+    n_cells = int(cells.max()) + 1 if len(cells) else 0
+    occupied = np.flatnonzero(np.bincount(cells, minlength=n_cells))
+    block = {'dimension': occupied // n_periods, 'period': period_values[occupied % n_periods]}
+    for stat, values in (('sum', sums), ('count', counts)):
+        reduced = np.zeros((len(values), len(occupied)))
+        for out, row in zip(reduced, values):
+            out[:] = np.bincount(cells, row, minlength=n_cells)[occupied]
+        block[stat] = reduced
+    for stat, values, ufunc, fill in (('min', mins, np.minimum, np.inf), ('max', maxs, np.maximum, -np.inf)):
+        reduced = np.full((len(values), n_cells), fill)
+        for out, row in zip(reduced, values):
+            ufunc.at(out, cells, row)
+        block[stat] = reduced[:, occupied]
+    return block
+
+
+class RollupCube:
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 4
+
+    def __init__(self, data, max_dimension_cardinality=100):
+        profile = DatasetProfile.for_dataset(data)
+        date_columns = DateColumns.for_dataset(data).columns
+        self.date_column = next(iter(date_columns), None)
+        self.measures = profile.numeric_columns()
+        self.dimensions = [
+            col for col in profile.categorical_columns()
+            if col not in date_columns and 1 < profile.stats[col]['unique'] <= max_dimension_cardinality
+        ]
+        self.labels = {}
+        self._blocks = {}
+
+        if self.date_column is not None:
+            days = date_columns[self.date_column].to_numpy().astype('datetime64[D]')
+        else:
+            days = np.full(len(data), np.datetime64('NaT', 'D'))
+        values = data[self.measures].to_numpy(dtype='float64', na_value=np.nan).T.copy()
+        missing = np.isnan(values)
+        sums = np.where(missing, 0.0, values)
+        counts = (~missing).astype(float)
+        mins = np.where(missing, np.inf, values)
+        maxs = np.where(missing, -np.inf, values)
+        del values, missing
+        period_values, period_codes = np.unique(days, return_inverse=True)
+
+        for dimension in [None] + self.dimensions:
+            if dimension is None:
+                codes = np.zeros(len(data), dtype=np.int64)
+                self.labels[None] = np.array(['All'], dtype=object)
+            elif isinstance(data[dimension].dtype, pd.CategoricalDtype):
+                codes = data[dimension].cat.codes.to_numpy().astype(np.int64)
+                self.labels[dimension] = np.asarray(data[dimension].cat.categories, dtype=object)
+            else:
+                codes, uniques = pd.factorize(data[dimension])
+                self.labels[dimension] = np.asarray(uniques, dtype=object)
+            valid = codes >= 0
+            if valid.all():
+                self._blocks[(dimension, 'day')] = _reduce_cells(codes, period_codes, period_values, sums, counts, mins, maxs)
+            else:
+                self._blocks[(dimension, 'day')] = _reduce_cells(
+                    codes[valid], period_codes[valid], period_values,
+                    sums[:, valid], counts[:, valid], mins[:, valid], maxs[:, valid]
+                )
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached cube for a dataset, building it on first use."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            cube = cls._cache.get(fingerprint)
+            if cube is not None:
+                cls._cache.move_to_end(fingerprint)
+                return cube
+        cube = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = cube
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return cube
+
+    def _block(self, dimension, freq):
+        """Returns the cells for a dimension and frequency, rolling daily cells up on first request."""
+        key = (dimension, freq)
+        if key not in self._blocks:
+            day = self._blocks[(dimension, 'day')]
+            if freq == 'all':
+                periods = np.full(len(day['period']), np.datetime64('NaT', 'D'))
+            else:
+                periods = period_starts(day['period'], freq)
+            period_values, period_codes = np.unique(periods, return_inverse=True)
+            self._blocks[key] = _reduce_cells(
+                day['dimension'], period_codes, period_values, day['sum'], day['count'], day['min'], day['max']
+            )
+        return self._blocks[key]
+
+    @staticmethod
+    def _values(block, agg):
+        if agg == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return block['sum'] / block['count']
+        values = block[agg].astype(float)
+        if agg in ('min', 'max'):
+            values = np.where(np.isinf(values), np.nan, values)
+        return values
+
+    def series(self, measure, freq='month', agg='sum', dimension=None, start=None, end=None):
+        """Slices one measure into a period x dimension-value table."""
+        if dimension is not None and dimension not in self.dimensions:
+            raise KeyError(f"{dimension} is not a rollup dimension")
+        block = self._block(dimension, freq)
+        values = self._values(block, agg)[self.measures.index(measure)]
+        keep = ~np.isnat(block['period'])
+        if start is not None:
+            keep &= block['period'] >= np.datetime64(pd.Timestamp(start).date(), 'D')
+        if end is not None:
+            keep &= block['period'] <= np.datetime64(pd.Timestamp(end).date(), 'D')
+        table = pd.DataFrame({
+            'period': block['period'][keep].astype('datetime64[ns]'),
+            'dimension': self.labels[dimension][block['dimension'][keep]],
+            'value': values[keep],
+        }).pivot(index='period', columns='dimension', values='value')
+        if dimension is None:
+            table.columns = [measure]
+        else:
+            table.columns.name = dimension
+        return table
+
+    def totals(self, dimension=None, agg='sum'):
+        """Aggregates every measure per dimension value over all rows, including rows without a date."""
+        block = self._block(dimension, 'all')
+        table = pd.DataFrame(self._values(block, agg).T, columns=self.measures,
+                             index=pd.Index(self.labels[dimension][block['dimension']], name=dimension))
+        return table
+
+    def add_to_packer(self, packer, priority=1.2):
+        """Adds quarterly totals and per-dimension totals to a prompt packer, most recent quarters first."""
+        if not self.measures:
+            return packer
+        if self.date_column is not None:
+            quarterly = pd.concat([self.series(measure, 'quarter', 'sum') for measure in self.measures], axis=1)
+            quarterly.index = quarterly.index.to_period('Q').astype(str)
+            packer.add_table(quarterly.iloc[::-1].round(2), priority=priority,
+                             title=f"Quarterly totals by {self.date_column} (most recent first):")
+        for dimension in sorted(self.dimensions, key=lambda col: len(self.labels[col])):
+            totals = self.totals(dimension, 'sum').sort_values(self.measures[0], ascending=False)
+            packer.add_table(totals.round(2), priority=priority - 0.1,
+                             title=f"Totals by {dimension} (sorted by {self.measures[0]}):")
+        return packer
@@ -0,0 +1,184 @@
+# modules/segment_index.py
+
+import math
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from modules.dataset_store import dataset_fingerprint
+from modules.dataset_profile import DatasetProfile
+
+
+def hash_values(series):
+    """Hashes a column to uint64 keys; categoricals are hashed once per category."""
+    return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+
+class CountMinSketch:
+    """Count-Min sketch over uint64 keys: estimates never undercount and overcount by at most
+    epsilon * total weight with probability 1 - delta, for non-negative weights."""
+
+    def __init__(self, epsilon=1e-4, delta=0.01, seed=0):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width_bits = max(int(math.ceil(math.log2(math.e / epsilon))), 1)
+        self.width = 1 << self.width_bits
+        self.depth = max(int(math.ceil(math.log(1 / delta))), 1)
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2**63, self.depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._offsets = rng.integers(0, 2**63, self.depth, dtype=np.uint64)
+        self.table = np.zeros((self.depth, self.width))
+        self.total = 0.0
+
+    def _buckets(self, keys, row):
+        # Multiply-shift hashing; uint64 products wrap modulo 2**64 by design.
+        return ((keys ^ self._offsets[row]) * self._multipliers[row]) >> np.uint64(64 - self.width_bits)
+
+    def update(self, keys, weights):
+        keys = np.asarray(keys, dtype=np.uint64)
+        weights = np.asarray(weights, dtype=float)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(self._buckets(keys, row).astype(np.int64), weights, minlength=self.width)
+        self.total += float(weights.sum())
+
+    def query(self, keys):
+        keys = np.asarray(keys, dtype=np.uint64)
+        estimates = np.full(len(keys), np.inf)
+        for row in range(self.depth):
+            estimates = np.minimum(estimates, self.table[row][self._buckets(keys, row).astype(np.int64)])
+        return estimates
+
+    @property
+    def error_bound(self):
+        return self.epsilon * self.total
+
+
+class HeavyHitters:
+    """Tracks the heaviest keys of a weighted stream in bounded memory.
+
+    Each chunk is pre-aggregated, fed to a Count-Min sketch, and its heaviest keys compete with the
+    current candidates on their sketched totals, in the spirit of SpaceSaving; only `capacity`
+    candidates and their labels are ever kept.
+    """
+
+    def __init__(self, capacity, epsilon=1e-4, delta=0.01):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(epsilon, delta)
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.labels = {}
+
+    def update(self, keys, weights, values):
+        chunk_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        chunk_weights = np.bincount(inverse.reshape(-1), weights, minlength=len(chunk_keys))
+        self.sketch.update(chunk_keys, chunk_weights)
+        if len(chunk_keys) > self.capacity:
+            top = np.argpartition(chunk_weights, -self.capacity)[-self.capacity:]
+            chunk_keys, first = chunk_keys[top], first[top]
+        for key, position in zip(chunk_keys, first):
+            self.labels.setdefault(key, values[position])
+        candidates = np.union1d(self.keys, chunk_keys)
+        if len(candidates) > self.capacity:
+            estimates = self.sketch.query(candidates)
+            candidates = candidates[np.argpartition(estimates, -self.capacity)[-self.capacity:]]
+        self.keys = candidates
+        self.labels = {key: self.labels[key] for key in candidates}
+
+    def top(self, k):
+        estimates = self.sketch.query(self.keys)
+        order = np.argsort(-estimates, kind='stable')[:k]
+        return [self.labels[key] for key in self.keys[order]], estimates[order]
+
+
+class SegmentIndex:
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_cached = 4
+
+    def __init__(self, data, k=None, epsilon=None, delta=None, exact_max_cardinality=None, chunksize=1_000_000):
+        self.data = data
+        self.k = k or int(os.getenv('SEGMENT_TOP_K', 5))
+        self.epsilon = epsilon or float(os.getenv('SEGMENT_SKETCH_EPSILON', 1e-4))
+        self.delta = delta or float(os.getenv('SEGMENT_SKETCH_DELTA', 0.01))
+        self.exact_max_cardinality = exact_max_cardinality or int(os.getenv('SEGMENT_EXACT_MAX_CARDINALITY', 1000))
+        self.chunksize = chunksize
+        self.profile = DatasetProfile.for_dataset(data)
+        self._results = {}
+
+    @classmethod
+    def for_dataset(cls, data):
+        """Returns the cached segment index for a dataset, so rankings are computed once per column and metric."""
+        fingerprint = dataset_fingerprint(data)
+        with cls._lock:
+            index = cls._cache.get(fingerprint)
+            if index is not None:
+                cls._cache.move_to_end(fingerprint)
+                return index
+        index = cls(data)
+        with cls._lock:
+            cls._cache[fingerprint] = index
+            while len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        return index
+
+    def _weights(self, metric, start=0, stop=None):
+        if metric is None:
+            return np.ones(len(self.data.iloc[start:stop]))
+        return np.nan_to_num(self.data[metric].iloc[start:stop].to_numpy(dtype=float, na_value=np.nan))
+
+    def _top_exact(self, column, metric, k):
+        series = self.data[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series)
+        valid = codes >= 0
+        totals = np.bincount(codes[valid], self._weights(metric)[valid], minlength=len(uniques))
+        order = np.argsort(-totals, kind='stable')[:k]
+        return list(np.asarray(uniques, dtype=object)[order]), totals[order], 0.0
+
+    def _top_sketched(self, column, metric, k):
+        hitters = HeavyHitters(max(20 * k, 100), self.epsilon, self.delta)
+        for start in range(0, len(self.data), self.chunksize):
+            stop = start + self.chunksize
+            values = self.data[column].iloc[start:stop]
+            valid = values.notna().to_numpy()
+            hitters.update(hash_values(values[valid]), self._weights(metric, start, stop)[valid], values[valid].to_numpy())
+        labels, estimates = hitters.top(k)
+        return labels, estimates, hitters.sketch.error_bound
+
+    def top_k(self, column, metric=None, k=None):
+        """Ranks the segments of column by the total of metric (or by row count), returning the top k.
+
+        Columns with more distinct values than exact_max_cardinality are ranked with sketches, which
+        requires a non-negative metric; the result's error_bound is the most any estimate can exceed
+        the true total, with probability 1 - delta.
+        """
+        k = k or self.k
+        key = (column, metric, k)
+        if key not in self._results:
+            cardinality = self.profile.stats[column].get('unique')
+            if cardinality is None:
+                cardinality = self.data[column].nunique()
+            sketched = cardinality > self.exact_max_cardinality
+            if sketched and metric is not None and (self.data[metric] < 0).any():
+                sketched = False
+            labels, totals, error_bound = (self._top_sketched if sketched else self._top_exact)(column, metric, k)
+            score = f"{metric} total" if metric else "rows"
+            result = pd.DataFrame({score: totals}, index=pd.Index(labels, name=column))
+            result.attrs['error_bound'] = error_bound
+            result.attrs['sketched'] = sketched
+            self._results[key] = result
+        return self._results[key]
+
+    def segment_summary(self, column, metric=None, k=None):
+        """Exact means of every numeric column for the top k segments, in rank order, with their row counts."""
+        top = self.top_k(column, metric, k)
+        numeric_cols = [col for col in self.profile.numeric_columns() if col != column]
+        subset = self.data.loc[self.data[column].isin(top.index), [column] + numeric_cols]
+        grouped = subset.groupby(column, observed=True)
+        summary = grouped[numeric_cols].mean()
+        summary.insert(0, 'rows', grouped.size())
+        summary = summary.reindex(top.index)
+        summary.attrs.update(top.attrs)
+        return summary
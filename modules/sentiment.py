@@ -0,0 +1,93 @@
+# modules/sentiment.py
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from nltk.sentiment import SentimentIntensityAnalyzer
+import nltk
+
+
+nltk.download('vader_lexicon', quiet=True)
+
+
+class HeadlineSentiment:
+    """Scores headlines in batches with VADER, memoizing compound scores by a hash of the headline text.
+
+    Each distinct headline in a batch is scored once, and headlines seen in earlier batches (on any
+    rerun, for any company) are served from the memo, which keeps the most recently used max_entries
+    scores.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, analyzer=None, max_entries=None):
+        self.analyzer = analyzer or SentimentIntensityAnalyzer()
+        self.max_entries = max_entries or int(os.getenv('SENTIMENT_MEMO_MAX_ENTRIES', 50_000))
+        self.hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """Returns the process-wide pipeline so memoized scores survive Streamlit reruns."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def make_key(text):
+        return hashlib.blake2b(' '.join(text.split()).encode('utf-8'), digest_size=16).digest()
+
+    def score(self, texts):
+        """Returns the compound score of every text as a float array aligned with the input."""
+        texts = pd.Series(texts, dtype=object).fillna('').astype(str)
+        codes, unique = pd.factorize(texts)
+        keys = [self.make_key(text) for text in unique]
+        scores = np.empty(len(unique))
+        missing = []
+        with self._lock:
+            for position, key in enumerate(keys):
+                cached = self._memo.get(key)
+                if cached is None:
+                    missing.append(position)
+                else:
+                    self._memo.move_to_end(key)
+                    scores[position] = cached
+            self.hits += len(unique) - len(missing)
+            self.misses += len(missing)
+        for position in missing:
+            scores[position] = self.analyzer.polarity_scores(unique[position])['compound']
+        with self._lock:
+            for position in missing:
+                self._memo[keys[position]] = scores[position]
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return scores[codes] if len(codes) else np.empty(0)
+
+    @staticmethod
+    def aggregate(news, group='Symbol', time_column='providerPublishTime', score_column='Sentiment'):
+        """Per-group and per-group-per-day sentiment from a scored news table, returned as (by_group, by_day)."""
+        labels = np.sign(news[score_column].to_numpy(dtype=float))
+        scored = news.assign(positive=labels > 0, negative=labels < 0, day=news[time_column].dt.floor('D'))
+        by_group = scored.groupby(group).agg(
+            headlines=(score_column, 'size'),
+            mean_sentiment=(score_column, 'mean'),
+            positive_share=('positive', 'mean'),
+            negative_share=('negative', 'mean'),
+            latest=(time_column, 'max'),
+        )
+        by_day = scored.groupby([group, 'day']).agg(
+            headlines=(score_column, 'size'),
+            mean_sentiment=(score_column, 'mean'),
+        )
+        return by_group, by_day
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._memo)}
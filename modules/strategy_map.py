@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from modules.llm_interface import LLMInterface
+from modules.dataset_profile import DatasetProfile
 
 class StrategyMap:
     def __init__(self, dataset, llm):
@@ -12,8 +13,9 @@ class StrategyMap:
 
     def generate_scenarios(self, strategy_input):
         """Generates different strategic scenarios and their potential impact."""
+        data_summary = DatasetProfile.for_dataset(self.dataset).pack_summary(value_counts=False)
         prompt = (
-            f"Given the following dataset summary:\n{self.dataset.describe(include='all').to_string()}\n\n"
+            f"Given the following dataset summary:\n{data_summary}\n\n"
             f"Analyze the potential impact of the following strategy: {strategy_input}\n"
             f"Provide a detailed projection of key business metrics such as Sales, Revenue, Profit, Customer Satisfaction, and Market Share over the next 12 months."
         )
@@ -0,0 +1,27 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from modules.forecasting import ForecastEngine, design_matrix
+
+
+def test_metric_with_gaps_gets_intervals_from_its_observed_periods():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2019-01-01', '2022-12-31', freq='D')
+    data = pd.DataFrame({
+        'Order Date': dates.strftime('%d-%m-%Y'),
+        'Sales': rng.normal(10, 1, len(dates)),
+        'Profit': rng.normal(5, 1, len(dates)),
+    })
+    data.loc[dates >= '2022-01-01', 'Profit'] = np.nan
+    engine = ForecastEngine(data)
+    fit = engine.fit('mean')
+    history, forecast = engine.forecast(3, 'mean')
+
+    n = len(history)
+    observed = history['Profit'].notna().to_numpy()
+    X = design_matrix(np.arange(n), fit['season_length'], fit['harmonics'])[observed]
+    X_future = design_matrix(np.arange(n, n + 3), fit['season_length'], fit['harmonics'])
+    leverage = np.einsum('ij,jk,ik->i', X_future, np.linalg.pinv(X.T @ X), X_future)
+    expected = NormalDist().inv_cdf(0.975) * np.sqrt(1.0 + leverage) * fit['sigma'][1]
+    margin = forecast[('Profit', 'upper')] - forecast[('Profit', 'forecast')]
+    assert np.allclose(margin.to_numpy(), expected)
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from modules.query_engine import QueryEngine
+
+
+def shuffled_sales(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2021-01-01', '2022-12-31', freq='D')
+    data = pd.DataFrame({
+        'Order Date': dates.strftime('%d-%m-%Y'),
+        'Region': rng.choice(['East', 'West'], len(dates)),
+        'Sales': rng.integers(1, 100, len(dates)).astype(float),
+    })
+    return data.iloc[rng.permutation(len(data))].reset_index(drop=True)
+
+
+def test_bucketed_plan_with_limit_returns_earliest_periods_in_order():
+    engine = QueryEngine(shuffled_sales())
+    plan = engine.validate({
+        'time_bucket': {'column': 'Order Date', 'freq': 'month'},
+        'aggregations': [{'column': 'Sales', 'func': 'sum', 'as': 'total_sales'}],
+        'limit': 12,
+    })
+    result = engine.run(plan)
+    periods = result['Order Date (month)']
+    assert list(periods) == list(pd.date_range('2021-01-01', periods=12, freq='MS'))
+
+
+def test_bucketed_plan_orders_by_period_then_group():
+    engine = QueryEngine(shuffled_sales(seed=1))
+    plan = engine.validate({
+        'time_bucket': {'column': 'Order Date', 'freq': 'year'},
+        'groupby': ['Region'],
+        'aggregations': [{'column': 'Sales', 'func': 'sum', 'as': 'total_sales'}],
+    })
+    result = engine.run(plan)
+    assert list(zip(result['Order Date (year)'].dt.year, result['Region'])) == [
+        (2021, 'East'), (2021, 'West'), (2022, 'East'), (2022, 'West'),
+    ]